@@ -0,0 +1,234 @@
+"""
+Throughput benchmarks for the writers.
+
+Every workload generates code into a sink, which only counts the written bytes and lines, so that the numbers
+reflect the writers and not the file system. Run it with
+
+    python benchmarks/bench_writers.py [--scale 1.0] [--repeat 5] [--save baseline.json]
+
+and compare a later run against a saved baseline with
+
+    python benchmarks/bench_writers.py --compare baseline.json [--tolerance 0.1]
+
+which exits with status 1, if a workload got slower than the tolerance allows. To check an upgrade, save the baseline
+with the installed version and compare against it with the new version on the `PYTHONPATH`, e.g.
+
+    PYTHONPATH=path/to/new/src python benchmarks/bench_writers.py --compare baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from CodeWriter import Writer, FortranWriter, PythonWriter, LatexWriter
+
+
+class CountingSink:
+    """
+    File-like object, which discards everything written to it, but counts UTF-8 encoded bytes and lines.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text) if text.isascii() else len(text.encode())
+        self.lines += text.count("\n")
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def flat_print(writer: Writer, n: int):
+    for i in range(20 * n):
+        writer.print("x =", i, "+ y")
+
+
+def deep_blocks(writer: Writer, n: int):
+    def nest(depth: int):
+        if depth == 0:
+            writer.print("leaf")
+            return
+        with writer.block(f"begin {depth}", f"end {depth}"):
+            writer.print("statement")
+            nest(depth - 1)
+
+    for _ in range(n):
+        nest(20)
+
+
+def listing_churn(writer: Writer, n: int):
+    for _ in range(n):
+        with writer.listing("begin list", "item", "end list"):
+            for i in range(20):
+                writer.item(f"entry {i}")
+                writer.print("text")
+
+
+def fortran_module(writer: FortranWriter, n: int):
+    writer.comment("Generated by the benchmark suite.")
+    with writer.module("bench"):
+        writer.use("iso_fortran_env, only: dp => real64")
+        writer.print("implicit none")
+        writer.contains()
+        for i in range(n):
+            with writer.function(f"f{i}", "x", "y", result="r", pure=True):
+                writer.declare("real(dp)", "x", "y", intent="in")
+                writer.declare("real(dp)", "r")
+                writer.print(f"r = x * {i} + y")
+            with writer.subroutine(f"s{i}", "k", "out"):
+                writer.declare("integer", "k", intent="in")
+                writer.declare("real(dp)", "out", intent="out")
+                with writer.select("k"):
+                    for j in range(5):
+                        writer.case(str(j))
+                        writer.print(f"out = {j}.0_dp")
+                    writer.item("default")
+                    with writer.if_then("k < 0"):
+                        writer.print("out = -1.0_dp")
+
+
+def python_classes(writer: PythonWriter, n: int):
+    for i in range(n):
+        with writer.new_class(f"Class{i}", "object"):
+            with writer.function("__init__", "self", "values", return_type="None"):
+                writer.print("self.values = values")
+            with writer.function("total", "self", return_type="float"):
+                writer.print("result = 0.0")
+                with writer.for_loop("value", "self.values"):
+                    with writer.if_statement("value > 0"):
+                        writer.print("result += value")
+                        writer.else_statement()
+                        writer.print("result -= value")
+                with writer.range_loop("i", "0", "10", "2"):
+                    writer.print("result *= 1.0")
+                with writer.while_loop("result > 1e6"):
+                    writer.print("result /= 2")
+                writer.print("return result")
+
+
+def latex_document(writer: LatexWriter, n: int):
+    writer.print(r"\documentclass{article}")
+    with writer.environment("document"):
+        for i in range(n):
+            with writer.itemize(label=r"\textbullet"):
+                for j in range(5):
+                    writer.item(f"Item {i}.{j}")
+                    with writer.enumerate():
+                        writer.item("first")
+                        writer.item("second")
+
+
+WORKLOADS: dict[str, tuple[type[Writer], Callable, int]] = {
+    "flat_print": (Writer, flat_print, 1000),
+    "deep_blocks": (Writer, deep_blocks, 500),
+    "listing_churn": (Writer, listing_churn, 1000),
+    "fortran_module": (FortranWriter, fortran_module, 2000),
+    "python_classes": (PythonWriter, python_classes, 1000),
+    "latex_document": (LatexWriter, latex_document, 1000),
+}
+
+
+def run(writer_cls: type[Writer], workload: Callable, n: int, **writer_kwargs) -> CountingSink:
+    sink = CountingSink()
+    writer = writer_cls(file=sink, **writer_kwargs)
+    workload(writer, n)
+    # older versions write unbuffered and have no 'close'
+    if hasattr(writer, "close"):
+        writer.close()
+    return sink
+
+
+def measure(name: str, scale: float, repeat: int, **writer_kwargs) -> dict:
+    writer_cls, workload, n = WORKLOADS[name]
+    n = max(1, int(n * scale))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sink = run(writer_cls, workload, n, **writer_kwargs)
+        best = min(best, time.perf_counter() - start)
+    # peak memory is measured in a separate run, since tracing slows down the generation considerably
+    tracemalloc.start()
+    run(writer_cls, workload, n, **writer_kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": best,
+        "lines": sink.lines,
+        "bytes": sink.bytes,
+        "lines_per_second": sink.lines / best,
+        "bytes_per_second": sink.bytes / best,
+        "peak_memory": peak,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the results with a baseline and returns the names of all workloads, which got slower by more than
+    `tolerance` (relative).
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["lines_per_second"]
+        change = result["lines_per_second"] / old - 1
+        marker = ""
+        if change < -tolerance:
+            regressions.append(name)
+            marker = "  <-- regression"
+        print(f"{name:<16} {old:>14,.0f} -> {result['lines_per_second']:>14,.0f} lines/s ({change:+.1%}){marker}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("workloads", nargs="*", help=f"workloads to run (default: all of {', '.join(WORKLOADS)})")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor for the size of every workload")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs, the best one is reported")
+    parser.add_argument("--buffer-size", type=int, default=0, help="'buffer_size' passed to every writer")
+    parser.add_argument("--save", metavar="FILE", help="store the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results with a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown (default: 0.1)")
+    args = parser.parse_args(argv)
+    for name in args.workloads:
+        if name not in WORKLOADS:
+            parser.error(f"unknown workload '{name}'")
+    # only pass options, which were changed, so that older versions of the package can be benchmarked as well
+    writer_kwargs = {"buffer_size": args.buffer_size} if args.buffer_size else {}
+
+    results = {}
+    print(f"{'workload':<16} {'lines':>10} {'lines/s':>14} {'MB/s':>8} {'peak KiB':>10}")
+    for name in args.workloads or WORKLOADS:
+        result = measure(name, args.scale, args.repeat, **writer_kwargs)
+        results[name] = result
+        print(
+            f"{name:<16} {result['lines']:>10,} {result['lines_per_second']:>14,.0f} "
+            f"{result['bytes_per_second'] / 1e6:>8.1f} {result['peak_memory'] / 1024:>10,.0f}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(
+                {"python": platform.python_version(), "scale": args.scale, "results": results}, file, indent=2
+            )
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if baseline["scale"] != args.scale:
+            print(f"warning: the baseline was recorded with --scale {baseline['scale']}", file=sys.stderr)
+        print()
+        if compare(results, baseline["results"], args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
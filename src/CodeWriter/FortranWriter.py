@@ -1,8 +1,17 @@
-from . import Writer, Block, Listing
+import re
+from itertools import chain
+from math import prod
+from typing import Any, Callable, Iterable, Iterator, Sequence, Union
+
+from . import Writer, Block, Listing, Node
+from ._arrays import format_chunks, shape_of, split, wrap
+from ._loops import check_unrolling, offset, operand, unrolled_body
 import textwrap
 
 
 class Function(Block):
+    __slots__ = ()
+
     def __init__(
         self,
         writer: Writer,
@@ -32,6 +41,8 @@ class Function(Block):
 
 
 class Subroutine(Block):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, name: str, *args: str, trailing=True):
         super().__init__(
             f"subroutine {name}({', '.join(args)})",
@@ -41,21 +52,130 @@ class Subroutine(Block):
 
 
 class Module(Block):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, name: str):
         super().__init__(f"module {name}", f"end module {name}", writer)
 
 
 class Select(Listing):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, value: str):
         super().__init__(f"select case ({value})", "end select", writer, "case")
 
 
 class If(Listing):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, condition: str):
         super().__init__(f"if ({condition}) then", "end if", writer, "else")
 
 
+class Do(Block):
+    __slots__ = ()
+
+    def __init__(
+        self, writer: Writer, variable: str, start: str, stop: str, step: str = ""
+    ):
+        bounds = ", ".join(s for s in (start, stop, step) if s)
+        super().__init__(f"do {variable} = {bounds}", "end do", writer)
+
+
+class DoConcurrent(Block):
+    __slots__ = ()
+
+    def __init__(self, writer: Writer, *ranges: str, mask: str = ""):
+        header = ", ".join((*ranges, mask) if mask else ranges)
+        super().__init__(f"do concurrent ({header})", "end do", writer)
+
+
+class OmpDo(Do):
+    """
+    Do loop preceded by an OpenMP directive, whose end directive follows the loop.
+    """
+
+    __slots__ = ("directive", "end_directive")
+
+    def __init__(
+        self,
+        writer: Writer,
+        construct: str,
+        clauses: str,
+        variable: str,
+        start: str,
+        stop: str,
+        step: str = "",
+    ):
+        super().__init__(writer, variable, start, stop, step)
+        self.directive = f"!$omp {construct}" + (f" {clauses}" if clauses else "")
+        self.end_directive = f"!$omp end {construct}"
+
+    def __enter__(self):
+        self.writer.print(self.directive)
+        super().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+        self.writer.print(self.end_directive)
+
+
+def omp_clauses(
+    private: Sequence[str] = (),
+    firstprivate: Sequence[str] = (),
+    reduction: Sequence[str] = (),
+    schedule: str = "",
+    collapse: int = 0,
+    clauses: str = "",
+) -> str:
+    """
+    Formats the clauses of an OpenMP directive.
+    :param private: sequence of str, optional
+        Private variables.
+    :param firstprivate: sequence of str, optional
+        Private variables initialized with the value before the construct.
+    :param reduction: sequence of str, optional
+        Reductions in the form 'operator:variables', e.g. '+:total'.
+    :param schedule: str, optional
+        Loop schedule, e.g. 'static' or 'dynamic, 16'.
+    :param collapse: int, optional
+        Number of nested loops, which get collapsed.
+    :param clauses: str, optional
+        Further clauses, which are appended unchanged.
+    :return: str
+        Clauses separated by whitespaces.
+    """
+    result = []
+    if private:
+        result.append(f"private({', '.join(private)})")
+    if firstprivate:
+        result.append(f"firstprivate({', '.join(firstprivate)})")
+    result.extend(f"reduction({r})" for r in reduction)
+    if schedule:
+        result.append(f"schedule({schedule})")
+    if collapse:
+        result.append(f"collapse({collapse})")
+    if clauses:
+        result.append(clauses)
+    return " ".join(result)
+
+
+# name of the module in a use statement, which may be preceded by a module nature
+_USED_MODULE = re.compile(r"\s*(?:,\s*(?:non_)?intrinsic\s*::)?\s*(\w+)", re.IGNORECASE)
+# use statements in inserted text, which may span several lines
+_USE_STATEMENT = re.compile(r"^[ \t]*use\b" + _USED_MODULE.pattern, re.IGNORECASE | re.MULTILINE)
+# maximal number of continuation lines of a statement in the Fortran standard
+_CONTINUATION_LINES = 255
+# booleans formatted by Python or NumPy and their Fortran literals
+_LOGICAL_LITERALS = {"True": ".true.", "False": ".false."}
+
+
 class FortranWriter(Writer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # names of all modules, which were used with `use`
+        self.used_modules: list[str] = []
+
     def function(
         self,
         name: str,
@@ -91,8 +211,27 @@ class FortranWriter(Writer):
         self.print(comment, flush=flush)
 
     def use(self, module: str, flush=False):
+        match = _USED_MODULE.match(module)
+        if match:
+            self._add_used_modules((match.group(1),))
         self.print(f"use {module}", flush=flush)
 
+    def _inserted(self, *lines: Union[str, Writer, Node]):
+        # spliced fragments and filled placeholders can contain use statements, too
+        for line in lines:
+            if isinstance(line, FortranWriter):
+                self._add_used_modules(line.used_modules)
+            elif isinstance(line, Node):
+                self._add_used_modules(_used_in_node(line))
+            elif isinstance(line, str):
+                self._add_used_modules(match.group(1) for match in _USE_STATEMENT.finditer(line))
+
+    def _add_used_modules(self, modules: Iterable[str]):
+        for module in modules:
+            module = module.lower()
+            if module not in self.used_modules:
+                self.used_modules.append(module)
+
     def declare(
         self, type: str, *variables: str, allocatable=False, intent=None, flush=False
     ):
@@ -116,3 +255,306 @@ class FortranWriter(Writer):
 
     def if_then(self, condition: str):
         return super().block(If(self, condition))
+
+    def do(self, variable: str, start: str, stop: str, step: str = ""):
+        return super().block(Do(self, variable, start, stop, step))
+
+    def unrolled_do(
+        self,
+        variable: str,
+        start: str | int,
+        stop: str | int,
+        body: Callable[[str], Any],
+        factor: int | None = 4,
+        step: int = 1,
+    ):
+        """
+        Writes a do loop, whose body is repeated `factor` times per iteration, followed by the remaining iterations.
+        If the bounds are constant, the remaining iterations are written without a loop and short loops are unrolled
+        completely.
+        :param variable: str
+            Loop variable.
+        :param start: str or int
+            First value of the loop variable.
+        :param stop: str or int
+            Inclusive last value of the loop variable.
+        :param body: callable
+            Function, which writes the body of a single iteration with the given index expression, e.g. 'i + 2'. The
+            expression is not put in parentheses.
+        :param factor: int or None, optional
+            Number of iterations per loop iteration. None unrolls a loop with constant bounds completely.
+        :param step: int, optional
+            Step of the loop variable, which has to be positive for variable bounds.
+        """
+        constant = isinstance(start, int) and isinstance(stop, int)
+        check_unrolling(constant, factor, step)
+        stride = str(factor * step) if factor is not None and factor * step != 1 else ""
+        if constant:
+            values = range(start, stop + (1 if step > 0 else -1), step)
+            if factor is None or len(values) <= factor:
+                for value in values:
+                    body(str(value))
+                return
+            unrolled = len(values) // factor * factor
+            with self.do(variable, str(start), str(values[unrolled - factor]), stride):
+                unrolled_body(variable, step, factor, body)
+            for value in values[unrolled:]:
+                body(str(value))
+            return
+        start, stop = str(start), str(stop)
+        with self.do(variable, start, offset(stop, -(factor - 1) * step), stride):
+            unrolled_body(variable, step, factor, body)
+        # start of the remaining iterations, which are fewer than `factor`, the division truncates towards zero, which
+        # leaves the remainder loop empty for empty ranges
+        trip_count = offset(f"{stop} - {operand(start)}", step)
+        rest = f"{start} + ({trip_count}) / {factor * step} * {factor * step}"
+        with self.do(variable, rest, stop, str(step) if step != 1 else ""):
+            body(variable)
+
+    def do_concurrent(self, *ranges: str, mask: str = ""):
+        """
+        Creates a `do concurrent` loop.
+        :param ranges: str
+            Index ranges, e.g. 'i = 1:n'.
+        :param mask: str, optional
+            Logical mask expression.
+        """
+        return super().block(DoConcurrent(self, *ranges, mask=mask))
+
+    def omp_parallel_do(
+        self,
+        variable: str,
+        start: str,
+        stop: str,
+        step: str = "",
+        private: Sequence[str] = (),
+        firstprivate: Sequence[str] = (),
+        reduction: Sequence[str] = (),
+        schedule: str = "",
+        collapse: int = 0,
+        simd=False,
+        clauses: str = "",
+    ):
+        """
+        Creates a do loop parallelized with an `!$omp parallel do` directive. The clauses are described in
+        `omp_clauses`.
+        :param simd: bool, optional
+            Whether the loop should also be vectorized (`!$omp parallel do simd`).
+        """
+        return super().block(
+            OmpDo(
+                self,
+                "parallel do simd" if simd else "parallel do",
+                omp_clauses(private, firstprivate, reduction, schedule, collapse, clauses),
+                variable,
+                start,
+                stop,
+                step,
+            )
+        )
+
+    def omp_simd(
+        self,
+        variable: str,
+        start: str,
+        stop: str,
+        step: str = "",
+        private: Sequence[str] = (),
+        reduction: Sequence[str] = (),
+        clauses: str = "",
+    ):
+        """
+        Creates a do loop vectorized with an `!$omp simd` directive. The clauses are described in `omp_clauses`.
+        """
+        return super().block(
+            OmpDo(
+                self,
+                "simd",
+                omp_clauses(private, reduction=reduction, clauses=clauses),
+                variable,
+                start,
+                stop,
+                step,
+            )
+        )
+
+    def array_constant(
+        self,
+        name: str,
+        values: Any,
+        type: str = "real(8)",
+        parameter=True,
+        kind: str = "",
+        line_length: int = 132,
+    ):
+        """
+        Declares an array initialized with the given values. The values are formatted in chunks and written as
+        continuation lines, which do not exceed the free-form line length. Arrays, which need more than 255
+        continuation lines, are split into several statements: parameters are concatenated from parameters
+        `{name}_1`, `{name}_2` and so on, other arrays are initialized by data statements for array sections.
+        :param name: str
+            Name of the array.
+        :param values: array-like
+            NumPy array (of any dimension), object supporting the buffer protocol or sequence of numbers. Floats are
+            written with the shortest representation, which round-trips exactly.
+        :param type: str, optional
+            Type of the array. For real types every value is written as a real literal and for logical types booleans
+            are written as '.true.' and '.false.'.
+        :param parameter: bool, optional
+            Whether the array is declared as a parameter or initialized with a data statement.
+        :param kind: str, optional
+            Kind parameter of real literals, e.g. 'dp' for '1.5_dp'. By default, double precision literals like
+            '1.5d0' are written.
+        :param line_length: int, optional
+            Maximal length of the written lines.
+        """
+        shape = shape_of(values)
+        if 0 in shape:
+            raise ValueError("Empty arrays can not be initialized with a constructor!")
+        literals = (value for chunk in format_chunks(values, "F") for value in chunk)
+        if type.lower().startswith(("real", "double")):
+            suffix, exponent = (f"_{kind}", "e") if kind else ("d0", "d")
+            literals = (_real_literal(value, suffix, exponent) for value in literals)
+        elif type.lower().startswith("logical"):
+            literals = map(_logical_literal, literals)
+        else:
+            literals = map(_literal, literals)
+        self.indentation_level += 1
+        width = line_length - len(self._prefix(self.indentation_level))
+        self.indentation_level -= 1
+        batches = split(literals, width, ", &", _CONTINUATION_LINES)
+        first = next(batches)
+        second = next(batches, None)
+        if second is None:
+            # everything fits into a single statement
+            self._array_statement(type, name, shape, first, parameter, width)
+            return
+        batches = chain((first, second), batches)
+        if parameter:
+            # parameters are concatenated from parts, which fit into single statements
+            parts = []
+            for batch in batches:
+                parts.append((f"{name}_{len(parts) + 1}", len(batch)))
+                self._array_statement(type, parts[-1][0], (len(batch),), batch, True, width)
+            while True:
+                groups = list(split((part for part, _ in parts), width, ", &", _CONTINUATION_LINES))
+                if len(groups) == 1:
+                    break
+                # too many parts for a single statement, so they get concatenated in groups first
+                count = len(parts)
+                sizes = dict(parts)
+                parts = []
+                for group in groups:
+                    count += 1
+                    size = sum(sizes[part] for part in group)
+                    parts.append((f"{name}_{count}", size))
+                    self._array_statement(type, parts[-1][0], (size,), group, True, width)
+            self._array_statement(type, name, shape, groups[0], True, width)
+            return
+        self.declare(type, f"{name}({', '.join(map(str, shape))})")
+        start = 0
+        for batch in batches:
+            # every batch is initialized by data statements for array sections covering its part of the array
+            offset = 0
+            for subscripts, size in _sections(shape, start, start + len(batch)):
+                self.print(f"data {name}({', '.join(subscripts)}) / &")
+                self.indentation_level += 1
+                self.write_lines(wrap(batch[offset : offset + size], width, ", &", " /"))
+                self.indentation_level -= 1
+                offset += size
+            start += len(batch)
+
+    def _array_statement(
+        self, type: str, name: str, shape: tuple[int, ...], items: list[str], parameter: bool, width: int
+    ):
+        """
+        Writes a single statement of `array_constant`.
+        """
+        dimensions = ", ".join(map(str, shape))
+        if parameter:
+            if len(shape) > 1:
+                self.print(f"{type}, parameter :: {name}({dimensions}) = reshape([ &")
+                end = f"], [{dimensions}])"
+            else:
+                self.print(f"{type}, parameter :: {name}({dimensions}) = [ &")
+                end = "]"
+        else:
+            self.declare(type, f"{name}({dimensions})")
+            self.print(f"data {name} / &")
+            end = " /"
+        self.indentation_level += 1
+        self.write_lines(wrap(items, width, ", &", end))
+        self.indentation_level -= 1
+
+
+def _used_in_node(node: Node) -> Iterator[str]:
+    """
+    Yields the names of the modules of all use statements in a recorded tree.
+    """
+    for child in node.children:
+        if isinstance(child, Node):
+            yield from _used_in_node(child)
+        else:
+            for match in _USE_STATEMENT.finditer(child[1]):
+                yield match.group(1)
+
+
+def _sections(shape: Sequence[int], start: int, stop: int) -> Iterator[tuple[list[str], int]]:
+    """
+    Yields the subscripts of array sections, which cover the elements from `start` to `stop` (exclusive) in array
+    element order, and their sizes.
+    """
+    if len(shape) == 1:
+        yield [f"{start + 1}:{stop}"], stop - start
+        return
+    inner = prod(shape[:-1])
+    first, first_rest = divmod(start, inner)
+    last, last_rest = divmod(stop, inner)
+    if first == last:
+        for subscripts, size in _sections(shape[:-1], first_rest, last_rest):
+            yield [*subscripts, str(first + 1)], size
+        return
+    if first_rest:
+        for subscripts, size in _sections(shape[:-1], first_rest, inner):
+            yield [*subscripts, str(first + 1)], size
+        first += 1
+    if last > first:
+        yield [":"] * (len(shape) - 1) + [f"{first + 1}:{last}"], (last - first) * inner
+    if last_rest:
+        for subscripts, size in _sections(shape[:-1], 0, last_rest):
+            yield [*subscripts, str(last + 1)], size
+
+
+def _literal(value: str) -> str:
+    """
+    Checks, that a value formatted by Python or NumPy is no boolean, which requires a logical type.
+    """
+    if value in _LOGICAL_LITERALS:
+        raise ValueError(f"The value '{value}' can only be written to an array of logical type!")
+    return value
+
+
+def _logical_literal(value: str) -> str:
+    """
+    Converts a boolean formatted by Python or NumPy into a Fortran logical literal.
+    """
+    try:
+        return _LOGICAL_LITERALS[value]
+    except KeyError:
+        raise ValueError(f"The value '{value}' can not be written as a Fortran logical!") from None
+
+
+def _real_literal(value: str, suffix: str, exponent: str) -> str:
+    """
+    Converts a number formatted by Python or NumPy into a Fortran real literal.
+    """
+    if "n" in value or value in _LOGICAL_LITERALS:
+        raise ValueError(f"The value '{value}' can not be written as a Fortran literal!")
+    if "e" in value:
+        mantissa, power = value.split("e")
+        if exponent == "d":
+            return f"{mantissa}d{power}"
+        return f"{mantissa}e{power}{suffix}"
+    if "." not in value:
+        value = f"{value}.0"
+    return value + suffix
@@ -1,4 +1,38 @@
+from __future__ import annotations
+import os
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Iterable, Iterator, Sequence
+
 from . import Writer, Block, Listing
+from ._arrays import numpy
+from .sinks import UpdateFile
+
+# translation table for escaping all special characters of LaTeX in a single pass
+LATEX_ESCAPES = str.maketrans(
+    {
+        "&": r"\&",
+        "%": r"\%",
+        "$": r"\$",
+        "#": r"\#",
+        "_": r"\_",
+        "{": r"\{",
+        "}": r"\}",
+        "~": r"\textasciitilde{}",
+        "^": r"\textasciicircum{}",
+        "\\": r"\textbackslash{}",
+    }
+)
+
+# number of rows, which get formatted at once
+_ROWS_PER_BATCH = 1024
+
+
+def escape(text: str) -> str:
+    """
+    Escapes all special characters of LaTeX.
+    """
+    return text.translate(LATEX_ESCAPES)
 
 
 def get_parameters_str(required: str, optional: str):
@@ -10,6 +44,8 @@ def get_parameters_str(required: str, optional: str):
 
 
 class Environment(Block):
+    __slots__ = ()
+
     def __init__(
         self, name: str, writer: Writer, required: str = "", optional: str = ""
     ):
@@ -21,6 +57,8 @@ class Environment(Block):
 
 
 class LatexListing(Listing):
+    __slots__ = ()
+
     def __init__(
         self,
         writer,
@@ -39,16 +77,27 @@ class LatexListing(Listing):
 
 
 class Itemize(LatexListing):
+    __slots__ = ()
+
     def __init__(self, writer, label: str = "", optional: str = ""):
         super().__init__(writer, "itemize", label, optional)
 
 
 class Enumerate(LatexListing):
+    __slots__ = ()
+
     def __init__(self, writer, label: str = "", optional: str = ""):
         super().__init__(writer, "enumerate", label, optional)
 
 
 class LatexWriter(Writer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # names of all parts written with `include` and whether their content changed
+        self.parts: dict[str, bool] = {}
+        # path of the file with the \includeonly list, which gets written upon closing
+        self._include_only: str | None = None
+
     def environment(self, name: str, required: str = "", optional: str = ""):
         return super().block(Environment(name, self, required, optional))
 
@@ -57,3 +106,139 @@ class LatexWriter(Writer):
 
     def enumerate(self, label: str = "", optional: str = ""):
         return super().block(Enumerate(self, label, optional))
+
+    def tabular(
+        self,
+        rows: Any,
+        columns: str,
+        header: Sequence[str] | None = None,
+        formats: Sequence[str | None] | None = None,
+        escape_cells=True,
+    ):
+        """
+        Writes a complete tabular environment. The rows are formatted in batches and streamed, such that the memory
+        usage does not depend on the number of rows.
+        :param rows: iterable of sequences or 2-D NumPy array
+            Cells of the table row by row. It may also be a generator, which gets consumed lazily.
+        :param columns: str
+            Column specification, e.g. 'lrr'.
+        :param header: sequence of str, optional
+            Cells of the header row, which is separated by a horizontal line. They get escaped like the other cells.
+        :param formats: sequence of str or None, optional
+            printf-style format for every column, e.g. '%.3f'. Columns without format are converted with `str`.
+            Columns of NumPy arrays get formatted vectorized.
+        :param escape_cells: bool, optional
+            Whether special characters in cells without a format should be escaped.
+        """
+        with self.environment("tabular", columns):
+            self._table_rows(rows, header, formats, escape_cells)
+
+    def longtable(
+        self,
+        rows: Any,
+        columns: str,
+        header: Sequence[str] | None = None,
+        formats: Sequence[str | None] | None = None,
+        escape_cells=True,
+        caption: str = "",
+    ):
+        """
+        Writes a complete longtable environment, whose header gets repeated on every page. See `tabular` for the
+        arguments.
+        :param caption: str, optional
+            Caption of the table, which is not escaped.
+        """
+        with self.environment("longtable", columns):
+            if caption:
+                self.print(rf"\caption{{{caption}}} \\")
+            self._table_rows(rows, header, formats, escape_cells, r"\endhead")
+
+    def _table_rows(
+        self,
+        rows: Any,
+        header: Sequence[str] | None,
+        formats: Sequence[str | None] | None,
+        escape_cells: bool,
+        end_header: str = "",
+    ):
+        if header is not None:
+            self.print(" & ".join(map(escape, header)) + r" \\")
+            self.print(r"\hline")
+            if end_header:
+                self.print(end_header)
+        for batch in _batches(rows):
+            # format the batch column by column and join the cells row by row
+            columns = [
+                _format_column(column, formats[i] if formats else None, escape_cells)
+                for i, column in enumerate(batch)
+            ]
+            self.write_lines(" & ".join(cells) + r" \\" for cells in zip(*columns))
+
+    @contextmanager
+    def include(self, name: str, directory: str | os.PathLike = ".") -> Iterator[LatexWriter]:
+        """
+        Writes a part of the document into its own file, which is included with \\include. The file is only
+        replaced, if its content changed (see `UpdateFile`).
+        :param name: str
+            Name of the part relative to the main document without the extension '.tex'.
+        :param directory: str or path-like, optional
+            Directory of the main document.
+        :return: LatexWriter
+            Writer for the part for use in a `with` statement.
+        """
+        self.print(rf"\include{{{name}}}")
+        with UpdateFile(os.path.join(directory, f"{name}.tex")) as file:
+            with LatexWriter(indentation=self.indentation, file=file, buffer_size=1 << 16) as writer:
+                yield writer
+        self.parts[name] = file.changed
+
+    def include_only(self, name: str = "includeonly", directory: str | os.PathLike = "."):
+        """
+        Inputs a file with an \\includeonly list of all parts, whose content changed in this run. It has to be
+        called in the preamble and the file gets written upon closing the writer.
+        :param name: str, optional
+            Name of the file relative to the main document without the extension '.tex'.
+        :param directory: str or path-like, optional
+            Directory of the main document.
+        """
+        self.print(rf"\input{{{name}}}")
+        self._include_only = os.path.join(directory, f"{name}.tex")
+
+    def close(self):
+        """
+        Writes all remaining buffered text and the \\includeonly list, if it was requested with `include_only`.
+        """
+        super().close()
+        if self._include_only is not None:
+            changed = [name for name, part_changed in self.parts.items() if part_changed]
+            with UpdateFile(self._include_only) as file:
+                file.write(rf"\includeonly{{{','.join(changed)}}}" + "\n")
+            self._include_only = None
+
+
+def _batches(rows: Any) -> Iterator[Sequence]:
+    """
+    Yields the columns of batches of rows.
+    """
+    if numpy is not None and isinstance(rows, numpy.ndarray):
+        for start in range(0, len(rows), _ROWS_PER_BATCH):
+            yield rows[start : start + _ROWS_PER_BATCH].T
+        return
+    rows = iter(rows)
+    while batch := list(islice(rows, _ROWS_PER_BATCH)):
+        yield list(zip(*batch))
+
+
+def _format_column(column: Iterable, format: str | None, escape_cells: bool) -> Iterable[str]:
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        if format is not None:
+            return numpy.char.mod(format, column).tolist()
+        column = column.astype(str).tolist()
+    elif format is not None:
+        return [format % cell for cell in column]
+    else:
+        column = map(str, column)
+    if escape_cells:
+        return [cell.translate(LATEX_ESCAPES) for cell in column]
+    return column
+
@@ -1,7 +1,90 @@
+from __future__ import annotations
+import hashlib
+import linecache
+import marshal
+import os
+import sys
+from collections import OrderedDict
+from io import StringIO
+from types import CodeType, ModuleType
+from typing import Any, Callable
+
 from . import Writer, Block, Listing
+from ._arrays import format_chunks, numpy, wrap
+from ._loops import check_unrolling, offset, operand, unrolled_body
+
+
+# compiled code objects by the hash of their source, least recently used first
+_code_cache: OrderedDict[str, CodeType] = OrderedDict()
+CODE_CACHE_SIZE = 256
+
+
+def load_source(source: str, name: str, cache_dir: str | os.PathLike | None = None) -> ModuleType:
+    """
+    Compiles Python source code and executes it in a new module without writing it to disk. Code objects are cached
+    by the hash of the source in memory and optionally on disk, such that loading the same source again skips the
+    compilation. The source is registered in `linecache`, so tracebacks show the generated lines, as long as its code
+    object is in the in-memory cache.
+    :param source: str
+        Python source code.
+    :param name: str
+        Name of the module, which is not added to `sys.modules`.
+    :param cache_dir: str or path-like, optional
+        Directory for caching the marshalled code objects.
+    :return: ModuleType
+        The executed module.
+    """
+    digest = hashlib.sha256(source.encode()).hexdigest()
+    filename = _filename(digest)
+    code = _code_cache.get(digest)
+    if code is not None:
+        _code_cache.move_to_end(digest)
+    else:
+        code = _compile(source, filename, digest, cache_dir)
+        _code_cache[digest] = code
+        if len(_code_cache) > CODE_CACHE_SIZE:
+            evicted, _ = _code_cache.popitem(last=False)
+            # the lines of the source are kept exactly as long as its code object
+            linecache.cache.pop(_filename(evicted), None)
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    module = ModuleType(name)
+    module.__file__ = filename
+    exec(code, module.__dict__)
+    return module
+
+
+def _filename(digest: str) -> str:
+    """
+    Gets the file name of generated code, which only depends on the source, such that cached code objects can be
+    shared between modules.
+    """
+    return f"<generated {digest[:16]}>"
+
+
+def _compile(source: str, filename: str, digest: str, cache_dir: str | os.PathLike | None) -> CodeType:
+    """
+    Loads the code object from the disk cache or compiles it and stores it in the disk cache.
+    """
+    if cache_dir is None:
+        return compile(source, filename, "exec")
+    path = os.path.join(cache_dir, f"{digest}.{sys.implementation.cache_tag}.marshal")
+    try:
+        with open(path, "rb") as file:
+            return marshal.loads(file.read())
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    code = compile(source, filename, "exec")
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(marshal.dumps(code))
+    os.replace(temporary, path)
+    return code
 
 
 class Function(Block):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, name: str, *args: str, return_type: str = ""):
         if return_type:
             return_type = f" -> {return_type}"
@@ -9,6 +92,8 @@ class Function(Block):
 
 
 class Class(Block):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, name: str, *args: str):
         arguments = ", ".join(args)
         if arguments:
@@ -17,11 +102,15 @@ class Class(Block):
 
 
 class ForLoop(Block):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, variable: str, iterable: str):
         super().__init__(f"for {variable} in {iterable}:", "", writer)
 
 
 class RangeLoop(ForLoop):
+    __slots__ = ()
+
     def __init__(
         self, writer: Writer, variable: str, start: str, stop: str = "", step: str = ""
     ):
@@ -30,11 +119,15 @@ class RangeLoop(ForLoop):
 
 
 class WhileLoop(Block):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, condition: str):
         super().__init__(f"while {condition}:", "", writer)
 
 
 class IfStatement(Listing):
+    __slots__ = ()
+
     def __init__(self, writer: Writer, condition: str):
         super().__init__(f"if {condition}:", "", writer, "else:")
 
@@ -52,6 +145,58 @@ class PythonWriter(Writer):
     def range_loop(self, variable: str, start: str, stop: str = "", step: str = ""):
         return super().block(RangeLoop(self, variable, start, stop, step))
 
+    def unrolled_range_loop(
+        self,
+        variable: str,
+        start: str | int,
+        stop: str | int,
+        body: Callable[[str], Any],
+        factor: int | None = 4,
+        step: int = 1,
+    ):
+        """
+        Writes a range loop, whose body is repeated `factor` times per iteration, followed by the remaining
+        iterations. If the bounds are constant, the remaining iterations are written without a loop and short loops
+        are unrolled completely.
+        :param variable: str
+            Loop variable.
+        :param start: str or int
+            Start of the range.
+        :param stop: str or int
+            Exclusive end of the range.
+        :param body: callable
+            Function, which writes the body of a single iteration with the given index expression, e.g. 'i + 2'. The
+            expression is not put in parentheses.
+        :param factor: int or None, optional
+            Number of iterations per loop iteration. None unrolls a loop with constant bounds completely.
+        :param step: int, optional
+            Step of the range, which has to be positive for variable bounds.
+        """
+        constant = isinstance(start, int) and isinstance(stop, int)
+        check_unrolling(constant, factor, step)
+        stride = str(factor * step) if factor is not None and factor * step != 1 else ""
+        if constant:
+            values = range(start, stop, step)
+            if factor is None or len(values) <= factor:
+                for value in values:
+                    body(str(value))
+                return
+            unrolled = len(values) // factor * factor
+            end = values[unrolled] if unrolled < len(values) else stop
+            with self.range_loop(variable, str(start), str(end), stride):
+                unrolled_body(variable, step, factor, body)
+            for value in values[unrolled:]:
+                body(str(value))
+            return
+        start, stop = str(start), str(stop)
+        with self.range_loop(variable, start, offset(stop, -(factor - 1) * step), stride):
+            unrolled_body(variable, step, factor, body)
+        # start of the remaining iterations, which are fewer than `factor`
+        trip_count = offset(f"{stop} - {operand(start)}", step - 1)
+        rest = f"{start} + max({trip_count}, 0) // {factor * step} * {factor * step}"
+        with self.range_loop(variable, rest, stop, str(step) if step != 1 else ""):
+            body(variable)
+
     def while_loop(self, condition: str):
         return super().block(WhileLoop(self, condition))
 
@@ -85,3 +230,66 @@ class PythonWriter(Writer):
         self.indentation_level -= 1
         self.print("elif", f"{condition}:")
         self.indentation_level += 1
+
+    def load_module(self, name: str, cache_dir: str | os.PathLike | None = None) -> ModuleType:
+        """
+        Compiles the generated code and executes it in a new module (see `load_source`). The writer has to be in
+        deferred mode or write to a file, which supports `getvalue` like `io.StringIO`.
+        :param name: str
+            Name of the module.
+        :param cache_dir: str or path-like, optional
+            Directory for caching the marshalled code objects.
+        :return: ModuleType
+            The executed module.
+        """
+        if self.tree is not None:
+            file = StringIO()
+            self.render(file)
+            source = file.getvalue()
+        else:
+            self.flush()
+            try:
+                source = self.file.getvalue()
+            except AttributeError:
+                raise TypeError(
+                    "The generated code can not be read back from the file, use an 'io.StringIO' or deferred mode!"
+                )
+        return load_source(source, name, cache_dir)
+
+    def array_literal(self, name: str, values: Any, line_length: int = 88):
+        """
+        Assigns a list literal with the given values to a variable. The values are formatted in chunks and written in
+        lines not exceeding `line_length`.
+        :param name: str
+            Name of the variable.
+        :param values: array-like
+            NumPy array, object supporting the buffer protocol or iterable of numbers. Multi-dimensional NumPy arrays
+            are written as nested lists. Floats are written with the shortest representation, which round-trips
+            exactly.
+        :param line_length: int, optional
+            Maximal length of the written lines.
+        """
+        with self.block(f"{name} = [", "]"):
+            self._array_values(values, line_length)
+
+    def _array_values(self, values: Any, line_length: int):
+        if numpy is not None and getattr(values, "ndim", 1) > 1:
+            for row in values:
+                with self.block("[", "],"):
+                    self._array_values(row, line_length)
+            return
+        literals = (
+            _python_literal(value) for chunk in format_chunks(values) for value in chunk
+        )
+        width = line_length - len(self._prefix(self.indentation_level))
+        self.write_lines(wrap(literals, width, ",", ","))
+
+
+def _python_literal(value: str) -> str:
+    """
+    Converts a number formatted by Python or NumPy into a Python literal.
+    """
+    if "n" in value:
+        # nan and inf
+        return f'float("{value}")'
+    return value
@@ -1,7 +1,45 @@
-from .core import Writer, Block, Listing
+from .core import Writer, Block, Listing, Node, Placeholder
 from .LaTeXWriter import LatexWriter
 from .PythonWriter import PythonWriter
 from .FortranWriter import FortranWriter
+from .aio import AsyncWriter, AsyncFortranWriter, AsyncPythonWriter, AsyncLatexWriter
+from .parallel import generate_parallel, generate_files
+from .template import Template
+from .profiling import Profiler
+from .index import BlockIndex, IndexedFile
+from .project import FortranProject
+from .cache import FragmentCache
+from .dedup import deduplicate, DedupReport
+from .sinks import Sink, CompressedSink, TeeSink, PipeSink, UpdateFile, FileUpdater
 
 
-__all__ = ["Writer", "Block", "Listing", "LatexWriter", "PythonWriter", "FortranWriter"]
+__all__ = [
+    "Writer",
+    "Block",
+    "Listing",
+    "Node",
+    "Placeholder",
+    "LatexWriter",
+    "PythonWriter",
+    "FortranWriter",
+    "AsyncWriter",
+    "AsyncFortranWriter",
+    "AsyncPythonWriter",
+    "AsyncLatexWriter",
+    "generate_parallel",
+    "generate_files",
+    "Template",
+    "Profiler",
+    "BlockIndex",
+    "IndexedFile",
+    "FortranProject",
+    "FragmentCache",
+    "deduplicate",
+    "DedupReport",
+    "Sink",
+    "CompressedSink",
+    "TeeSink",
+    "PipeSink",
+    "UpdateFile",
+    "FileUpdater",
+]
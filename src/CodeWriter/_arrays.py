@@ -0,0 +1,142 @@
+from __future__ import annotations
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+# number of values, which get formatted at once
+CHUNK_SIZE = 1 << 14
+
+
+def shape_of(values: Any) -> tuple[int, ...]:
+    """
+    Gets the shape of a NumPy array, an object supporting the buffer protocol or a sequence.
+    """
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values.shape
+    try:
+        return memoryview(values).shape
+    except TypeError:
+        return (len(values),)
+
+
+def format_chunks(values: Any, order: str = "C") -> Iterator[list[str]]:
+    """
+    Formats the values of a flattened array in chunks. Floats are formatted with the shortest representation, which
+    round-trips exactly. NumPy arrays are formatted vectorized.
+    :param values: array-like
+        NumPy array, object supporting the buffer protocol or iterable of numbers.
+    :param order: str, optional
+        'C' or 'F', the order in which multi-dimensional arrays are flattened.
+    :return: iterator of list of str
+        Formatted values in chunks of `CHUNK_SIZE`.
+    """
+    if numpy is not None and not isinstance(values, (list, tuple)):
+        try:
+            array = numpy.asarray(values)
+        except TypeError:
+            array = None
+        if array is not None and array.dtype.kind in "biuf":
+            array = array.ravel(order)
+            for start in range(0, array.size, CHUNK_SIZE):
+                yield array[start : start + CHUNK_SIZE].astype(str).tolist()
+            return
+    try:
+        view = memoryview(values)
+    except TypeError:
+        iterator = iter(values)
+    else:
+        if view.ndim > 1:
+            raise ValueError("Multi-dimensional buffers are only supported with NumPy installed!")
+        iterator = iter(view)
+    while chunk := list(map(repr, islice(iterator, CHUNK_SIZE))):
+        yield chunk
+
+
+def wrap(
+    items: Iterable[str],
+    width: int,
+    line_end: str,
+    last_end: str,
+    separator: str = ", ",
+) -> Iterator[str]:
+    """
+    Packs items into lines, which are at most `width` characters long including the line ends, unless a single item
+    is longer.
+    :param items: iterable of str
+        Items, which get joined with `separator`.
+    :param width: int
+        Maximal length of the lines.
+    :param line_end: str
+        String appended to every line except the last one.
+    :param last_end: str
+        String appended to the last line.
+    :param separator: str, optional
+        String between two items in the same line.
+    :return: iterator of str
+        Lines, there are none for no items.
+    """
+    line: list[str] = []
+    length = -len(separator)
+    for item in items:
+        length += len(separator) + len(item)
+        if length + len(line_end) > width and line:
+            yield separator.join(line) + line_end
+            line.clear()
+            length = len(item)
+        line.append(item)
+    if not line:
+        return
+    # the last line only fits with `line_end`, so its last items are moved to a separate line, if `last_end` is longer
+    last: list[str] = []
+    while length + len(last_end) > width and len(line) > 1:
+        item = line.pop()
+        last.append(item)
+        length -= len(separator) + len(item)
+    if last:
+        yield separator.join(line) + line_end
+        line = last[::-1]
+    yield separator.join(line) + last_end
+
+
+def split(
+    items: Iterable[str],
+    width: int,
+    line_end: str,
+    max_lines: int,
+    separator: str = ", ",
+) -> Iterator[list[str]]:
+    """
+    Splits items into lists, which `wrap` packs into at most `max_lines` lines with the same arguments. One line is
+    kept in reserve for a last line, which gets split, since its end is longer.
+    :param items: iterable of str
+        Items, which get joined with `separator`.
+    :param width: int
+        Maximal length of the lines including the line ends.
+    :param line_end: str
+        String appended to every line except the last one.
+    :param max_lines: int
+        Maximal number of lines for every list.
+    :param separator: str, optional
+        String between two items in the same line.
+    :return: iterator of list of str
+        Lists of items, there are none for no items.
+    """
+    batch: list[str] = []
+    lines = 1
+    length = -len(separator)
+    for item in items:
+        length += len(separator) + len(item)
+        if length + len(line_end) > width and batch:
+            lines += 1
+            length = len(item)
+            if lines >= max_lines:
+                yield batch
+                batch = []
+                lines = 1
+        batch.append(item)
+    if batch:
+        yield batch
@@ -0,0 +1,45 @@
+from __future__ import annotations
+from typing import Any, Callable
+
+
+def offset(expression: str, value: int) -> str:
+    """
+    Adds a constant to an expression.
+    """
+    if value > 0:
+        return f"{expression} + {value}"
+    if value < 0:
+        return f"{expression} - {-value}"
+    return expression
+
+
+def operand(expression: str) -> str:
+    """
+    Puts an expression in parentheses, unless it is a name or a number.
+    """
+    if expression.isidentifier() or expression.isdigit():
+        return expression
+    return f"({expression})"
+
+
+def check_unrolling(constant: bool, factor: int | None, step: int):
+    """
+    Raises a ValueError, if a loop cannot be unrolled.
+    """
+    if step == 0:
+        raise ValueError("The step of a loop must not be 0!")
+    if factor is not None and factor < 1:
+        raise ValueError(f"The unroll factor must be positive, but it is {factor}!")
+    if not constant:
+        if factor is None:
+            raise ValueError("Loops with variable bounds cannot be unrolled completely!")
+        if step < 0:
+            raise ValueError("Loops with variable bounds can only be unrolled with positive steps!")
+
+
+def unrolled_body(variable: str, step: int, factor: int, body: Callable[[str], Any]):
+    """
+    Calls `body` with the index expressions of `factor` consecutive iterations.
+    """
+    for i in range(factor):
+        body(offset(variable, i * step))
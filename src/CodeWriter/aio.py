@@ -0,0 +1,118 @@
+from __future__ import annotations
+from typing import Any, Protocol
+
+from .core import Writer
+from .FortranWriter import FortranWriter
+from .LaTeXWriter import LatexWriter
+from .PythonWriter import PythonWriter
+
+
+class StreamWriter(Protocol):
+    """
+    The parts of `asyncio.StreamWriter`, which are used by `AsyncWriter`.
+    """
+
+    def write(self, data: bytes) -> Any:
+        ...
+
+    async def drain(self) -> Any:
+        ...
+
+
+class AsyncWriter(Writer):
+    """
+    Writer for use inside of asyncio applications.
+
+    Printing never blocks, since all text is collected in the internal buffer. Blocks (and all language specific
+    blocks of the subclasses) can be used in `async with` statements, which write the buffer to the stream and wait
+    for it to drain, once `buffer_size` characters were collected. Long stretches of prints outside of blocks should
+    `await drain()` from time to time, and `await aclose()` writes the remaining text.
+    """
+
+    def __init__(
+        self,
+        indentation: str = " " * 4,
+        indentation_level: int = 0,
+        file: StreamWriter | None = None,
+        buffer_size: int = 1 << 16,
+        encoding: str = "utf-8",
+        deferred: bool = False,
+        **kwargs,
+    ):
+        """
+        Creates a new AsyncWriter object.
+        :param indentation: str, optional
+            String, which is used for indenting.
+        :param indentation_level: int, optional
+            Starting indentation_level
+        :param file: StreamWriter
+            Stream, e.g. an `asyncio.StreamWriter`, which gets the encoded text.
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get written to the stream.
+        :param encoding: str, optional
+            Encoding of the text.
+        :param deferred: bool, optional
+            Whether lines and blocks should be recorded in a tree instead of being written (see `Writer`), e.g. for
+            fragments created by `fragment`.
+        :param kwargs:
+            Further arguments of the language specific writers.
+        """
+        super().__init__(indentation, indentation_level, file, buffer_size, deferred=deferred, **kwargs)
+        self.encoding = encoding
+
+    def _write(self, text: str, flush=False):
+        # the text is only written, when the writer gets drained or flushed
+        self._chunks.append(text)
+        self._buffered += len(text)
+
+    def _write_chunks(self):
+        if self._chunks and not self._placeholders:
+            self.file.write("".join(self._chunks).encode(self.encoding))
+            self._chunks.clear()
+            self._buffered = 0
+
+    def flush(self):
+        """
+        Hands the buffered text to the stream without waiting for it to drain.
+        """
+        self._write_chunks()
+
+    async def drain(self):
+        """
+        Writes the buffered text to the stream and waits until it is drained, if at least `buffer_size` characters
+        were collected.
+        """
+        if self._buffered >= self.buffer_size:
+            await self.aflush()
+
+    async def aflush(self):
+        """
+        Writes the buffered text to the stream and waits until it is drained.
+        """
+        self._write_chunks()
+        await self.file.drain()
+
+    async def aclose(self):
+        """
+        Writes all remaining buffered text to the stream and waits until it is drained. The stream itself is not
+        closed, since it is not owned by the writer.
+        """
+        await self.aflush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+class AsyncFortranWriter(AsyncWriter, FortranWriter):
+    pass
+
+
+class AsyncPythonWriter(AsyncWriter, PythonWriter):
+    pass
+
+
+class AsyncLatexWriter(AsyncWriter, LatexWriter):
+    pass
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import hashlib
+import inspect
+import marshal
+import os
+from functools import wraps
+from typing import Any, Callable
+
+from .core import Writer, Node
+
+# version of the stored format, which is part of every key
+_FORMAT = 2
+# types, whose representation identifies their value exactly
+_EXACT_REPR = (bool, int, float, complex, str)
+
+
+class FragmentCache:
+    """
+    Persistent cache for generator functions, which only depend on their arguments.
+
+    Decorated functions get a writer as their first argument. On the first call the output is recorded in a fragment
+    (see `Writer.fragment`), stored on disk and spliced into the writer. Later calls with the same arguments, the same
+    source code of the function and the same type and indentation of the writer splice the stored fragment at the
+    current indentation level without running the function. The return value of the function is not cached.
+
+    The arguments are hashed by their content. Supported are None, booleans, numbers, strings, bytes, NumPy arrays
+    and lists, tuples, dictionaries and sets of them. Arguments of other types raise a TypeError, unless `key`
+    converts them into supported values.
+
+    The cache is bounded by `max_bytes`, the least recently used entries are removed first.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_bytes: int = 1 << 28,
+        key: Callable[[Any], Any] | None = None,
+    ):
+        """
+        Create a new `FragmentCache` object.
+        :param directory: str or path-like
+            Directory of the cache, which gets created if missing.
+        :param max_bytes: int, optional
+            Maximal size of all entries.
+        :param key: callable, optional
+            Gets every argument of an unsupported type and returns a supported value, which identifies its content
+            independently of the process.
+        """
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, function: Callable[..., Any]) -> Callable[..., None]:
+        try:
+            source = inspect.getsource(function)
+        except (OSError, TypeError):
+            source = function.__code__.co_code.hex()
+
+        @wraps(function)
+        def cached(writer: Writer, *args, **kwargs):
+            key = _stable_hash(
+                (_FORMAT, source, type(writer).__qualname__, writer.indentation, args, kwargs), self.key
+            )
+            path = os.path.join(self.directory, f"{key}.marshal")
+            entry = self._load(path)
+            if entry is None:
+                self.misses += 1
+                fragment = writer.fragment()
+                function(fragment, *args, **kwargs)
+                entry = _flatten(fragment.tree, 0)
+                self._store(path, entry)
+            else:
+                self.hits += 1
+            node = Node()
+            node.children.extend(entry)
+            writer.splice(node)
+
+        return cached
+
+    def _load(self, path: str) -> list | None:
+        try:
+            with open(path, "rb") as file:
+                entry = marshal.loads(file.read())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        # mark the entry as recently used
+        os.utime(path)
+        return entry
+
+    def _store(self, path: str, entry: list):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(marshal.dumps(entry))
+        os.replace(temporary, path)
+        self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used entries, until the cache fits into `max_bytes`.
+        """
+        entries = []
+        size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".marshal"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                size += stat.st_size
+        entries.sort()
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".marshal"):
+                os.remove(entry.path)
+
+
+def _flatten(node: Node, level: int) -> list[tuple[int, str, str, bool]]:
+    """
+    Converts a recorded tree into a list of lines with levels relative to the root.
+    """
+    lines = []
+    for child in node.children:
+        if isinstance(child, Node):
+            lines.extend(_flatten(child, level + child.level))
+        else:
+            relative_level, text, end, doubled = child
+            lines.append((level + relative_level, text, end, doubled))
+    return lines
+
+
+def _stable_hash(value: Any, key: Callable[[Any], Any] | None = None) -> str:
+    """
+    Hashes a value independent of the process, e.g. of the order of sets or the hash seed.
+    """
+    digest = hashlib.sha256()
+    _update(digest, value, key)
+    return digest.hexdigest()
+
+
+def _update(digest, value: Any, key: Callable[[Any], Any] | None):
+    if isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}(".encode())
+        for item in value:
+            _update(digest, item, key)
+        digest.update(b")")
+    elif isinstance(value, dict):
+        # dictionaries keep their order, which may affect the output
+        digest.update(f"dict{len(value)}(".encode())
+        for item in value.items():
+            _update(digest, item, key)
+        digest.update(b")")
+    elif isinstance(value, (set, frozenset)):
+        digest.update(f"set{len(value)}(".encode())
+        for item in sorted(_stable_hash(item, key) for item in value):
+            digest.update(item.encode())
+        digest.update(b")")
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(f"bytes{len(value)}:".encode())
+        digest.update(value)
+    elif hasattr(value, "tobytes") and hasattr(value, "dtype"):
+        # NumPy arrays
+        digest.update(f"array{value.dtype.str}{value.shape}:".encode())
+        digest.update(value.tobytes())
+    elif value is None or type(value) in _EXACT_REPR:
+        # subclasses may change their representation
+        text = repr(value)
+        digest.update(f"{type(value).__qualname__}{len(text)}:{text}".encode())
+    elif key is not None:
+        # the converted value must not be converted again
+        digest.update(f"key:{type(value).__module__}.{type(value).__qualname__}:".encode())
+        _update(digest, key(value), None)
+    else:
+        raise TypeError(
+            f"Arguments of type '{type(value).__qualname__}' can not be hashed stably, pass a 'key' function to the "
+            "cache, which converts them!"
+        )
@@ -1,7 +1,11 @@
 from __future__ import annotations
+import os
 import sys
+import threading
 import warnings
-from typing import Union, TextIO
+from itertools import islice
+from queue import Queue
+from typing import Any, Callable, Iterable, Iterator, Union, TextIO
 
 
 class Writer:
@@ -13,13 +17,21 @@ class Writer:
     The 'listing' method provides a way to create indented listings and should also be used in a with statement. Use the
     item method for new items inside a listing.
 
+    In deferred mode nothing is written while generating. Instead, all lines and blocks are recorded in a tree of
+    `Node` objects (see `tree`), which can be rendered with `render` as often as needed.
+
     """
 
+    # number of lines, which `write_lines` joins into a single write
+    _lines_per_write = 1024
+
     def __init__(
         self,
         indentation: str = " " * 4,
         indentation_level: int = 0,
         file: TextIO = sys.stdout,
+        buffer_size: int = 0,
+        deferred: bool = False,
     ):
         """
         Creates a new Writer object.
@@ -29,24 +41,83 @@ class Writer:
             Starting indentation_level
         :param file: object, optional
             See `file` argument of standard print method: https://docs.python.org/3/library/functions.html#print
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get written to `file` in a single call. The buffer
+            is also emptied by `flush`, `close` or a print with `flush=True`. The default of 0 writes every line
+            directly.
+        :param deferred: bool, optional
+            Whether lines and blocks should be recorded in a tree instead of being written to `file`. The tree gets
+            written by calling `render`.
         """
         self.indentation = indentation
         self.indentation_level = indentation_level
         self.file = file
+        self.buffer_size = buffer_size
+        # chunks of text, which were not yet written to `file`, and their total length
+        self._chunks: list[str] = []
+        self._buffered = 0
+        # number of placeholders, which were not filled yet, all text after the first one is held back
+        self._placeholders = 0
         # list of all currently active blocks
         self.blocks: list[Block] = []
+        # root of the recorded tree and the stack of open nodes with their absolute indentation level in deferred mode
+        self.tree: Node | None = None
+        self._nodes: list[tuple[Node, int]] = []
+        if deferred:
+            self.tree = Node(level=indentation_level)
+            self._nodes.append((self.tree, indentation_level))
+            # record instead of writing by shadowing the methods of the class
+            self._emit = self._record
+            self._open = self._open_node
+            self._close = self._close_node
+
+    @property
+    def indentation(self) -> str:
+        return self._indentation
+
+    @indentation.setter
+    def indentation(self, indentation: str):
+        self._indentation = indentation
+        # tables of the indentation and the newline replacement for every level, which get filled on demand
+        self._prefixes = [""]
+        self._newlines = ["\n"]
+
+    def _prefix(self, level: int) -> str:
+        """
+        Gets the indentation for the given level from the prefix table.
 
-    def __get_indentation(self) -> str:
+        :param level: int
+            indentation level
+        :return: str
+            indentation
         """
-        Gets the current indentation.
+        prefixes = self._prefixes
+        if level >= len(prefixes):
+            self._extend_tables(level)
+        return prefixes[level] if level > 0 else ""
 
+    def _newline(self, level: int) -> str:
+        """
+        Gets the replacement of a newline character for the given level from the newline table.
+
+        :param level: int
+            indentation level
         :return: str
-            current indentation
+            newline character followed by the indentation
         """
-        return self.indentation * self.indentation_level
+        newlines = self._newlines
+        if level >= len(newlines):
+            self._extend_tables(level)
+        return newlines[level] if level > 0 else "\n"
+
+    def _extend_tables(self, level: int):
+        for i in range(len(self._prefixes), level + 1):
+            prefix = self._indentation * i
+            self._prefixes.append(prefix)
+            self._newlines.append("\n" + prefix)
 
     def extend_newline(self, s: str) -> str:
-        return s.replace("\n", f"\n{self.__get_indentation()}")
+        return s.replace("\n", self._newline(self.indentation_level))
 
     def print(self, *args, sep=" ", end="\n", flush=False):
         """
@@ -65,11 +136,7 @@ class Writer:
         :param flush: bool, optional
             See: https://docs.python.org/3/library/functions.html#print
         """
-        # check for linebreaks in the arguments
-        args = [self.extend_newline(str(arg)) for arg in args]
-        # check for linebreaks in the separator
-        # extend linebreak with current indentation to guarantee correct indentation and warn user
-        sep = self.extend_newline(sep)
+        text = sep.join(map(str, args))
         # if the last character of 'end' is not a newline character warn the user
         if "\n" != end[-1]:
             warnings.warn(
@@ -77,10 +144,373 @@ class Writer:
                 "Correct indentation can not be guaranteed!",
                 UserWarning,
             )
-        # Start by indenting
-        print(self.__get_indentation(), end="", file=self.file)
-        # print arguments
-        print(*args, sep=sep, end=end, flush=flush, file=self.file)
+        self._emit(text, end, flush)
+
+    def write_lines(self, lines: Iterable[str], flush=False):
+        """
+        Writes every line of `lines` indented at the current level. This gives the same result as calling
+        `print(line)` for every line, but the lines are indented and written in batches.
+        :param lines: iterable of str
+            Lines without the trailing newline character. It may also be a generator, which gets consumed lazily.
+            Newline characters inside a line get extended with the current indentation.
+        :param flush: bool, optional
+            See: https://docs.python.org/3/library/functions.html#print
+        """
+        lines = iter(lines)
+        while batch := list(islice(lines, self._lines_per_write)):
+            # the joining newlines get indented together with the newlines inside the lines
+            self._emit("\n".join(batch))
+        if flush:
+            self.flush()
+
+    def write_block_text(self, text: str, flush=False):
+        """
+        Writes a (multi-line) text indented at the current level. This gives the same result as `print(text)`
+        without the handling of separators and line ends.
+        :param text: str
+            Text, which gets written followed by a newline character.
+        :param flush: bool, optional
+            See: https://docs.python.org/3/library/functions.html#print
+        """
+        self._emit(text, flush=flush)
+
+    def include_file(
+        self,
+        path: str | os.PathLike,
+        dedent=False,
+        encoding: str = "utf-8",
+        chunk_size: int = 1 << 16,
+        flush=False,
+    ):
+        """
+        Writes the lines of a text file indented at the current level. This gives the same result as calling
+        `write_lines` with the lines of the file, but the file is read and indented in chunks, so the memory usage
+        does not depend on the size of the file.
+        :param path: str or path-like
+            File, whose lines get written.
+        :param dedent: bool, optional
+            Whether the common leading whitespace of all lines should be removed like by `textwrap.dedent`. This
+            requires reading the file twice.
+        :param encoding: str, optional
+            Encoding of the file.
+        :param chunk_size: int, optional
+            Number of characters, which are read at once.
+        :param flush: bool, optional
+            See: https://docs.python.org/3/library/functions.html#print
+        """
+        if dedent:
+            margin = None
+            for text in _read_lines(path, encoding, chunk_size):
+                for line in text.split("\n"):
+                    stripped = line.lstrip(" \t")
+                    if not stripped:
+                        continue
+                    indent = line[: len(line) - len(stripped)]
+                    if margin is None:
+                        margin = indent
+                    elif not indent.startswith(margin):
+                        margin = os.path.commonprefix((margin, indent))
+            cut = len(margin or "")
+            for text in _read_lines(path, encoding, chunk_size):
+                # lines consisting only of whitespace get emptied
+                self._emit("\n".join(line[cut:] if line.strip(" \t") else "" for line in text.split("\n")))
+        else:
+            for text in _read_lines(path, encoding, chunk_size):
+                self._emit(text)
+        if flush:
+            self.flush()
+
+    def _emit(self, text: str, end: str = "\n", flush=False, doubled=False):
+        """
+        Indents text at the current level and writes it.
+        :param text: str
+            Text, whose newline characters get extended with the current indentation.
+        :param end: str, optional
+            String, which gets written unchanged after the text.
+        :param flush: bool, optional
+            See `_write`.
+        :param doubled: bool, optional
+            Whether newline characters are extended with twice the indentation. This is the case for the entry and
+            exit lines of blocks, which are extended once by the block and once more by `print`.
+        """
+        level = self.indentation_level
+        if "\n" in text:
+            text = text.replace("\n", self._newline(2 * level if doubled else level))
+        self._write(self._prefix(level) + text + end, flush)
+
+    def _record(self, text: str, end: str = "\n", flush=False, doubled=False):
+        """
+        Replaces `_emit` in deferred mode and records the text in the currently open node.
+        """
+        node, level = self._nodes[-1]
+        node.children.append((self.indentation_level - level, text, end, doubled))
+
+    def _open(self, block: Block):
+        """
+        Gets called before a block prints its entry line.
+        """
+
+    def _close(self, block: Block):
+        """
+        Gets called after a block printed its exit line.
+        """
+
+    def _open_node(self, block: Block):
+        """
+        Replaces `_open` in deferred mode and starts a new node in the tree.
+        """
+        parent, parent_level = self._nodes[-1]
+        node = Node(block, self.indentation_level - parent_level)
+        parent.children.append(node)
+        self._nodes.append((node, self.indentation_level))
+
+    def _close_node(self, block: Block):
+        """
+        Replaces `_close` in deferred mode and finishes the current node.
+        """
+        self._nodes.pop()
+
+    def render(
+        self,
+        file: TextIO | None = None,
+        node: Node | None = None,
+        indentation_level: int | None = None,
+    ):
+        """
+        Writes the tree recorded in deferred mode or a part of it.
+        :param file: object, optional
+            File, which the text gets written to. Defaults to the `file` of the writer.
+        :param node: Node, optional
+            Node, which gets rendered. Defaults to the whole tree.
+        :param indentation_level: int, optional
+            Indentation level of the node. Defaults to the starting indentation level for the whole tree and to 0
+            for any other node.
+        """
+        if file is None:
+            file = self.file
+        if node is None:
+            node = self.tree
+            if node is None:
+                raise RuntimeError("The writer is not in deferred mode!")
+            if indentation_level is None:
+                indentation_level = node.level
+        chunks = []
+        self._render(node, indentation_level or 0, chunks, file.write)
+        file.write("".join(chunks))
+
+    def _render(self, node: Node, level: int, chunks: list[str], write: Callable[[str], Any]):
+        """
+        Appends the indented lines of `node` to `chunks` and passes them to `write`, once there are enough of them.
+        """
+        for child in node.children:
+            if isinstance(child, Node):
+                self._render(child, level + child.level, chunks, write)
+                continue
+            relative_level, text, end, doubled = child
+            child_level = level + relative_level
+            if "\n" in text:
+                text = text.replace(
+                    "\n", self._newline(2 * child_level if doubled else child_level)
+                )
+            chunks.append(self._prefix(child_level) + text + end)
+            if len(chunks) >= self._lines_per_write:
+                write("".join(chunks))
+                chunks.clear()
+
+    def fragment(self) -> Writer:
+        """
+        Creates a writer of the same type in deferred mode, whose content can be inserted with `splice` at any
+        indentation level.
+        :return: Writer
+            New writer with the same indentation and a starting indentation level of 0.
+        """
+        return type(self)(indentation=self.indentation, deferred=True)
+
+    def splice(self, fragment: Union[Writer, Node]):
+        """
+        Inserts a fragment at the current indentation level. In deferred mode the fragment is only referenced and
+        neither copied nor rendered. Otherwise it gets rendered and written directly.
+        :param fragment: Writer or Node
+            Writer created by `fragment` (or any other writer in deferred mode) or a node of a recorded tree.
+        """
+        if isinstance(fragment, Writer) and fragment.tree is None:
+            raise ValueError("Only writers in deferred mode can be spliced!")
+        self._inserted(fragment)
+        if isinstance(fragment, Writer):
+            fragment = fragment.tree
+        if self.tree is not None:
+            parent, parent_level = self._nodes[-1]
+            # wrap the fragment, since it may be spliced again at another level, the level of the fragment itself is
+            # compensated, since rendering a node ignores it
+            node = Node(level=self.indentation_level - parent_level - fragment.level)
+            node.children.append(fragment)
+            parent.children.append(node)
+        else:
+            chunks = []
+            self._render(fragment, self.indentation_level, chunks, self._write)
+            if chunks:
+                self._write("".join(chunks))
+
+    def _inserted(self, *lines: Union[str, Writer, Node]):
+        """
+        Gets called with text and fragments, which are inserted without the other writer methods, i.e. by `splice`,
+        `Placeholder.fill`, `generate_parallel` and `Template.write`. Subclasses can override it to keep track of
+        their content.
+        :param lines: str, Writer or Node
+            Inserted text or fragments.
+        """
+
+    def _write(self, text: str, flush=False):
+        """
+        Writes already indented text either directly to `file` or into the internal buffer.
+        :param text: str
+            Text, which gets written unchanged.
+        :param flush: bool, optional
+            Whether the buffer and `file` should be flushed afterwards.
+        """
+        if self.buffer_size or self._placeholders:
+            self._chunks.append(text)
+            self._buffered += len(text)
+            if flush:
+                self.flush()
+            elif self._buffered >= self.buffer_size:
+                self._write_chunks()
+        else:
+            self.file.write(text)
+            if flush:
+                self.file.flush()
+
+    def _write_chunks(self):
+        """
+        Writes all buffered chunks to `file` in a single call, unless there are unfilled placeholders.
+        """
+        if self._chunks and not self._placeholders:
+            self.file.write("".join(self._chunks))
+            self._chunks.clear()
+            self._buffered = 0
+
+    def flush(self):
+        """
+        Writes the buffered text to `file` and flushes it.
+        """
+        self._write_chunks()
+        self.file.flush()
+
+    async def drain(self):
+        """
+        Gets awaited by blocks used in an `async with` statement. The synchronous writer writes directly and has
+        nothing to wait for.
+        """
+
+    def close(self):
+        """
+        Writes all remaining buffered text to `file`. The file itself is not closed, since it is not owned by the
+        writer.
+        """
+        if self._placeholders:
+            raise RuntimeError(f"There are still {self._placeholders} unfilled placeholders!")
+        self.flush()
+
+    def _fill(self, index: int, text: str):
+        """
+        Puts the text of a placeholder into its slot of the buffer and writes the buffer, once all placeholders are
+        filled.
+        :param index: int
+            Index of the slot in the buffered chunks.
+        :param text: str
+            Indented text of the placeholder.
+        """
+        self._chunks[index] = text
+        self._buffered += len(text)
+        self._placeholders -= 1
+        if not self._placeholders and (not self.buffer_size or self._buffered >= self.buffer_size):
+            self._write_chunks()
+
+    def placeholder(self) -> Placeholder:
+        """
+        Reserves a place at the current indentation level, which can be filled later with `Placeholder.fill`, e.g.
+        with declarations, which are only known after generating the rest of a block. Until all placeholders are
+        filled, the following text is held back in the internal buffer.
+        :return: Placeholder
+            The reserved place.
+        """
+        return Placeholder(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @classmethod
+    def stream(
+        cls,
+        script: Callable[..., Any],
+        *args,
+        lines=False,
+        chunk_size: int = 1 << 16,
+        max_chunks: int = 4,
+        **writer_kwargs,
+    ) -> Iterator[str]:
+        """
+        Runs a generator script in a background thread and yields its output lazily. The script is paused as long as
+        `max_chunks` chunks are waiting to be consumed, so the memory usage stays bounded. Closing the iterator early
+        (e.g. by breaking out of a `for` loop) stops the script.
+        :param script: callable
+            Gets a new writer of this type and `args` as arguments.
+        :param args:
+            Further arguments for `script`.
+        :param lines: bool, optional
+            Whether single lines (including their newline character) should be yielded instead of chunks.
+        :param chunk_size: int, optional
+            Number of characters, which are collected into one chunk.
+        :param max_chunks: int, optional
+            Number of chunks, which may wait to be consumed.
+        :param writer_kwargs:
+            Further arguments for creating the writer, e.g. `indentation`.
+        :return: iterator of str
+            Chunks or lines of the output.
+        """
+        queue: Queue = Queue(max_chunks)
+        file = _QueueFile(queue)
+        writer = cls(file=file, buffer_size=chunk_size, **writer_kwargs)
+
+        def run():
+            try:
+                script(writer, *args)
+                writer.close()
+            except _Cancelled:
+                pass
+            except BaseException as error:
+                queue.put(_Stop(error))
+                return
+            queue.put(_Stop())
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        # whether the script put its `_Stop` into the queue, it may still be running until it returns
+        stopped = False
+        try:
+            rest = ""
+            while not isinstance(chunk := queue.get(), _Stop):
+                if not lines:
+                    yield chunk
+                    continue
+                *complete, rest = (rest + chunk).split("\n")
+                for line in complete:
+                    yield line + "\n"
+            stopped = True
+            if chunk.error is not None:
+                raise chunk.error
+            if rest:
+                yield rest
+        finally:
+            if not stopped:
+                # make the script stop at its next write and unblock it, if it waits for the queue
+                file.cancelled = True
+                while not isinstance(queue.get(), _Stop):
+                    pass
+            thread.join()
 
     def block(self, entry_line: Union[str, Block], exit_line: str = "") -> Block:
         """
@@ -154,6 +584,8 @@ class Block:
     It should be created by the block method inside the `Writer` class or at least passed as the argument of the method.
     """
 
+    __slots__ = ("entry_line", "exit_line", "writer")
+
     def __init__(self, entry_line: str, exit_line: str, writer: Writer):
         """
         Create a new `Block` object.
@@ -169,19 +601,31 @@ class Block:
         self.writer = writer
 
     def __enter__(self):
+        writer = self.writer
+        writer._open(self)
         # upon entering a block print the entry line and extend possible newline characters
-        self.writer.print(self.writer.extend_newline(self.entry_line))
+        writer._emit(self.entry_line, doubled=True)
         # increase indentation level
-        self.writer.indentation_level += 1
+        writer.indentation_level += 1
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        writer = self.writer
         # upon exiting a block decrease indentation level
-        self.writer.indentation_level -= 1
+        writer.indentation_level -= 1
         # print the exit line and extend possible newline characters
         if self.exit_line:
-            self.writer.print(self.writer.extend_newline(self.exit_line))
+            writer._emit(self.exit_line, doubled=True)
+        writer._close(self)
         # remove this `Block` from the block list of the writer
-        self.writer.blocks.pop()
+        writer.blocks.pop()
+
+    async def __aenter__(self):
+        self.__enter__()
+        await self.writer.drain()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+        await self.writer.drain()
 
 
 class Listing(Block):
@@ -189,6 +633,8 @@ class Listing(Block):
     Subclass of `Block` for creating itemized listings.
     """
 
+    __slots__ = ("item", "in_item")
+
     def __init__(self, entry_line: str, exit_line: str, writer: Writer, item: str):
         """
         Create a new `Listing` object.
@@ -211,3 +657,142 @@ class Listing(Block):
         if self.in_item:
             self.writer.indentation_level -= 1
         super().__exit__(exc_type, exc_val, exc_tb)
+
+
+class Node:
+    """
+    Node of the tree, which a `Writer` records in deferred mode. The root node holds everything printed outside of any
+    block, every other node belongs to a block and holds its entry line, its content and its exit line.
+    Nodes can be rendered with `Writer.render` and moved or reused in other places of the tree.
+    """
+
+    __slots__ = ("block", "level", "children")
+
+    def __init__(self, block: Block | None = None, level: int = 0):
+        """
+        Create a new `Node` object.
+        :param block: Block, optional
+            The block which was recorded in this node or None for the root node.
+        :param level: int, optional
+            Indentation level relative to the parent node or the absolute starting level for the root node.
+        """
+        self.block = block
+        self.level = level
+        # tuples (relative level, text, end, doubled) for lines (see `Writer._emit`) and child nodes
+        self.children: list[tuple[int, str, str, bool] | Node] = []
+
+
+class Placeholder:
+    """
+    Place in the output of a `Writer`, which gets filled after the following text was generated.
+    It should be created by the placeholder method inside the `Writer` class.
+    """
+
+    __slots__ = ("writer", "level", "index", "node")
+
+    def __init__(self, writer: Writer):
+        """
+        Create a new `Placeholder` object at the current position of the writer.
+        :param writer: Writer
+            `Writer` object, which the placeholder belongs to.
+        """
+        self.writer = writer
+        self.level = writer.indentation_level
+        self.index = -1
+        self.node: Node | None = None
+        if writer.tree is not None:
+            # in deferred mode the placeholder is an empty node of the tree
+            parent, parent_level = writer._nodes[-1]
+            self.node = Node(level=self.level - parent_level)
+            parent.children.append(self.node)
+        else:
+            self.index = len(writer._chunks)
+            writer._chunks.append("")
+            writer._placeholders += 1
+
+    def fill(self, *lines: Union[str, Writer, Node]):
+        """
+        Fills the placeholder. Text, which was held back, gets written afterwards according to the buffering of the
+        writer.
+        :param lines: str, Writer or Node
+            Lines without the trailing newline character, which get indented like in `Writer.write_lines`, or
+            fragments (see `Writer.fragment`), which get inserted like in `Writer.splice`.
+        """
+        writer = self.writer
+        if self.node is None and self.index < 0:
+            raise RuntimeError("The placeholder was already filled!")
+        writer._inserted(*lines)
+        if self.node is not None:
+            for line in lines:
+                if isinstance(line, str):
+                    self.node.children.append((0, line, "\n", False))
+                else:
+                    node = line.tree if isinstance(line, Writer) else line
+                    wrapper = Node(level=-node.level)
+                    wrapper.children.append(node)
+                    self.node.children.append(wrapper)
+            self.node = None
+            return
+        chunks = []
+        prefix = writer._prefix(self.level)
+        newline = writer._newline(self.level)
+        for line in lines:
+            if isinstance(line, str):
+                chunks.append(prefix + line.replace("\n", newline) + "\n")
+            else:
+                node = line.tree if isinstance(line, Writer) else line
+                # `_render` clears its own list of chunks, whenever it passes them on
+                parts = []
+                writer._render(node, self.level, parts, chunks.append)
+                chunks.extend(parts)
+        writer._fill(self.index, "".join(chunks))
+        self.index = -1
+
+
+def _read_lines(path: str | os.PathLike, encoding: str, chunk_size: int) -> Iterator[str]:
+    """
+    Reads a text file in chunks and yields the complete lines of every chunk joined by newline characters.
+    """
+    with open(path, encoding=encoding) as file:
+        rest = ""
+        while chunk := file.read(chunk_size):
+            lines, newline, rest = (rest + chunk).rpartition("\n")
+            if newline:
+                yield lines
+        if rest:
+            yield rest
+
+
+class _Cancelled(Exception):
+    """
+    Raised inside of a script run by `Writer.stream`, when the iterator was closed.
+    """
+
+
+class _Stop:
+    """
+    Marks the end of the output of a script run by `Writer.stream`.
+    """
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException | None = None):
+        self.error = error
+
+
+class _QueueFile:
+    """
+    File-like object, which puts the written chunks into a queue.
+    """
+
+    def __init__(self, queue: Queue):
+        self.queue = queue
+        self.cancelled = False
+
+    def write(self, text: str):
+        if self.cancelled:
+            raise _Cancelled()
+        self.queue.put(text)
+
+    def flush(self):
+        pass
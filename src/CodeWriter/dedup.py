@@ -0,0 +1,272 @@
+from __future__ import annotations
+import ast
+import hashlib
+import re
+from bisect import bisect_right
+from typing import NamedTuple
+
+from .core import Writer, Node
+from .FortranWriter import FortranWriter, Function as FortranFunction, Module, Subroutine
+from .PythonWriter import PythonWriter, Function as PythonFunction
+
+_ROUTINE_NAME = re.compile(r"\b(?:function|subroutine|def)\s+(\w+)")
+_USE = re.compile(r"\s*use\b", re.IGNORECASE)
+
+
+class DedupReport(NamedTuple):
+    # number of removed copies of routines
+    routines: int
+    # number of bytes (UTF-8), by which the output got shorter, it is negative, if the added shared modules and use
+    # statements are longer than the removed copies
+    bytes: int
+
+
+def deduplicate(writer: Writer, shared_module: str = "shared_routines") -> DedupReport:
+    """
+    Removes repeated routines from the tree of a writer in deferred mode. Routines are compared by the hash of their
+    rendered text, so only identical routines (including their names) are merged.
+
+    For a `FortranWriter` every routine, which is contained in more than one module with the same `use` statements,
+    is moved into a new module `shared_module` in front of the others and replaced by `use` statements. The new
+    module gets the `use` statements of the original modules, routines from modules with different `use` statements
+    are moved into further modules with a numbered suffix. The routines must not depend on variables of their
+    original modules. For a `PythonWriter` repeated top-level functions without decorators are removed, as long as
+    their name was not bound otherwise in between (e.g. by an assignment, import or class), such that the first
+    definition is shared. This requires the recorded code to be valid Python, otherwise nothing is removed.
+    :param writer: FortranWriter or PythonWriter
+        Writer in deferred mode, whose tree gets changed in place.
+    :param shared_module: str, optional
+        Name of the module for the shared Fortran routines.
+    :return: DedupReport
+        Number of removed routines and change in size.
+    """
+    if writer.tree is None:
+        raise ValueError("Only writers in deferred mode can be deduplicated!")
+    size = _size(writer)
+    if isinstance(writer, FortranWriter):
+        routines = _deduplicate_fortran(writer, shared_module)
+    elif isinstance(writer, PythonWriter):
+        routines = _deduplicate_python(writer)
+    else:
+        raise TypeError(f"Deduplication is not supported for '{type(writer).__name__}'!")
+    return DedupReport(routines, size - _size(writer))
+
+
+def _deduplicate_fortran(writer: FortranWriter, shared_module: str) -> int:
+    # top-level routines of all modules and the nodes containing them by the use statements of the module and their
+    # hash
+    routines: dict[tuple[frozenset[str], bytes], list[tuple[Node, Node, Node]]] = {}
+    # use statements of every module in their order
+    headers: dict[int, list[str]] = {}
+    # a module may be found twice, if it was spliced more than once
+    modules = {id(module): module for module in _nodes(writer.tree, Module)}
+    for module in modules.values():
+        header = headers[id(module)] = _uses(module)
+        for parent, routine in _children(module, (FortranFunction, Subroutine)):
+            key = (frozenset(header), _hash(writer, routine))
+            routines.setdefault(key, []).append((module, parent, routine))
+
+    # shared routines and use statements of every shared module by the use statements of the original modules
+    shared: dict[frozenset[str], tuple[str, list[str], list[Node]]] = {}
+    names: set[tuple[frozenset[str], str]] = set()
+    uses: dict[int, tuple[Node, dict[str, list[str]]]] = {}
+    removed = 0
+    for (header, _), copies in routines.items():
+        name = _name(copies[0][2])
+        # routines with the same name, but different content can not be shared
+        if len(copies) < 2 or (header, name) in names:
+            continue
+        names.add((header, name))
+        if header not in shared:
+            module_name = shared_module if not shared else f"{shared_module}_{len(shared) + 1}"
+            shared[header] = (module_name, headers[id(copies[0][0])], [])
+        module_name, _, shared_routines = shared[header]
+        shared_routines.append(copies[0][2])
+        for module, parent, routine in copies:
+            parent.children.remove(routine)
+            module_names = uses.setdefault(id(module), (module, {}))[1].setdefault(module_name, [])
+            if name not in module_names:
+                module_names.append(name)
+        removed += len(copies) - 1
+    if not shared:
+        return 0
+
+    for module, module_names in uses.values():
+        # directly after the entry line of the module
+        for module_name, routine_names in reversed(module_names.items()):
+            module.children.insert(1, (1, f"use {module_name}, only: {', '.join(routine_names)}", "\n", False))
+    fragment = writer.fragment()
+    for module_name, header, shared_routines in shared.values():
+        with fragment.module(module_name):
+            for line in header:
+                fragment.print(line)
+            fragment.print("implicit none")
+            fragment.contains()
+            for routine in shared_routines:
+                fragment.splice(routine)
+    writer.tree.children.insert(0, fragment.tree)
+    return removed
+
+
+def _uses(module: Node) -> list[str]:
+    """
+    Gets the use statements of a module including the ones in spliced fragments or placeholders.
+    """
+    result = []
+    for child in module.children:
+        if isinstance(child, Node):
+            if child.block is None:
+                result.extend(_uses(child))
+            continue
+        for line in child[1].split("\n"):
+            if _USE.match(line):
+                result.append(line.strip())
+    return result
+
+
+def _deduplicate_python(writer: PythonWriter) -> int:
+    # top-level lines and nodes with the line number, where they start
+    children = list(_top_level(writer.tree))
+    starts = []
+    texts = []
+    lines = 1
+    for _, child in children:
+        starts.append(lines)
+        texts.append(_text(writer, child) if isinstance(child, Node) else child[1] + child[2])
+        lines += texts[-1].count("\n")
+    try:
+        module = ast.parse("".join(texts))
+    except SyntaxError:
+        return 0
+    # names declared global in functions may be rebound anywhere
+    blocked = {name for node in ast.walk(module) if isinstance(node, ast.Global) for name in node.names}
+
+    # hash of the latest definition of every name
+    definitions: dict[str, bytes] = {}
+    removed = []
+    for statement in module.body:
+        parent, function = children[bisect_right(starts, statement.lineno) - 1]
+        if (
+            isinstance(statement, ast.FunctionDef)
+            and not statement.decorator_list
+            and isinstance(function, Node)
+            and isinstance(function.block, PythonFunction)
+            and statement.name not in blocked
+        ):
+            digest = _hash(writer, function)
+            if definitions.get(statement.name) == digest:
+                removed.append((parent, function))
+            definitions[statement.name] = digest
+            continue
+        names = _bound_names(statement)
+        if names is None:
+            definitions.clear()
+        else:
+            for name in names:
+                definitions.pop(name, None)
+    for parent, function in removed:
+        parent.children.remove(function)
+    return len(removed)
+
+
+def _top_level(node: Node):
+    """
+    Yields the lines and nodes directly in a node or in nodes without a block together with the node containing
+    them.
+    """
+    for child in node.children:
+        if isinstance(child, Node) and child.block is None:
+            yield from _top_level(child)
+        else:
+            yield node, child
+
+
+def _bound_names(statement: ast.stmt) -> set[str] | None:
+    """
+    Gets the names, which a top-level statement binds or deletes, or None, if it may bind any name.
+    """
+    names = set()
+    nodes = [statement]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # the bodies have their own scope
+            names.add(node.name)
+            nodes.extend(node.decorator_list)
+            if isinstance(node, ast.ClassDef):
+                nodes.extend(node.bases)
+                nodes.extend(node.keywords)
+            else:
+                nodes.append(node.args)
+            continue
+        if isinstance(node, ast.Lambda):
+            nodes.append(node.args)
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+        nodes.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def _nodes(node: Node, block_type: type) -> list[Node]:
+    """
+    Finds all nodes of blocks of the given type in the tree.
+    """
+    result = []
+    for child in node.children:
+        if isinstance(child, Node):
+            if isinstance(child.block, block_type):
+                result.append(child)
+            else:
+                result.extend(_nodes(child, block_type))
+    return result
+
+
+def _children(node: Node, block_types: type | tuple[type, ...]) -> list[tuple[Node, Node]]:
+    """
+    Finds the nodes of blocks of the given types directly in a node or in nodes without a block, which were inserted
+    by `Writer.splice`, and the nodes containing them. Nodes without a block are replaced by copies, since they may
+    be shared with other places of the tree, where nothing should be removed.
+    """
+    result = []
+    for i, child in enumerate(node.children):
+        if not isinstance(child, Node):
+            continue
+        if isinstance(child.block, block_types):
+            result.append((node, child))
+        elif child.block is None:
+            copy = node.children[i] = Node(level=child.level)
+            copy.children = child.children.copy()
+            result.extend(_children(copy, block_types))
+    return result
+
+
+def _name(node: Node) -> str:
+    return _ROUTINE_NAME.search(node.block.entry_line).group(1)
+
+
+def _text(writer: Writer, node: Node, level: int = 0) -> str:
+    parts = []
+    chunks = []
+    writer._render(node, level, chunks, parts.append)
+    parts.extend(chunks)
+    return "".join(parts)
+
+
+def _hash(writer: Writer, node: Node) -> bytes:
+    return hashlib.sha256(_text(writer, node).encode()).digest()
+
+
+def _size(writer: Writer) -> int:
+    return len(_text(writer, writer.tree, writer.tree.level).encode())
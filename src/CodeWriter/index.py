@@ -0,0 +1,300 @@
+from __future__ import annotations
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from functools import wraps
+from itertools import islice
+from typing import Callable
+
+from .core import Writer, Block
+
+# file signature and version of the sidecar format
+_MAGIC = b"CWBI"
+_VERSION = 1
+# signature, version, number of blocks and length of the encoding name
+_HEADER = struct.Struct("<4sBxxxQQ")
+# columns of the index, which are stored as little-endian 64-bit integers
+_COLUMNS = ("parents", "start_lines", "end_lines", "start_bytes", "end_bytes")
+
+
+class BlockIndex:
+    """
+    Opt-in index of the blocks written by a `Writer`.
+
+    While attached, the index records the first entry line, the parent block and the start and end line and byte
+    offsets of every block in compact arrays. Line numbers are counted from 0 and the end offsets point right behind
+    the exit line, so the text of a block is the slice between its start and end bytes. It works by replacing
+    methods of the writer object only, like a `Profiler`.
+
+    Offsets are counted when text is written, so blocks are only indexed, when they are written directly and not in
+    deferred mode, spliced or filled into placeholders. Filling a placeholder (see `Writer.placeholder`) moves the
+    offsets of all blocks behind it. The offsets are relative to the position of the file, when the index was
+    attached.
+    """
+
+    def __init__(self, writer: Writer | None = None, encoding: str = "utf-8"):
+        """
+        Create a new `BlockIndex` object.
+        :param writer: Writer, optional
+            Writer, which the index gets attached to right away.
+        :param encoding: str, optional
+            Encoding of the written file, which is needed for the byte offsets.
+        """
+        self.encoding = encoding
+        # first entry line of every block
+        self.names: list[str] = []
+        # index of the parent block or -1 for blocks at the top
+        self.parents = array("q")
+        self.start_lines = array("q")
+        self.end_lines = array("q")
+        self.start_bytes = array("q")
+        self.end_bytes = array("q")
+        self._writer: Writer | None = None
+        self._saved: dict[str, Callable | None] = {}
+        # number of lines and bytes written so far
+        self._lines = 0
+        self._bytes = 0
+        # stack of the indices of the open blocks
+        self._open: list[int] = []
+        if writer is not None:
+            self.attach(writer)
+
+    def __enter__(self) -> BlockIndex:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._writer is not None:
+            self.detach()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def attach(self, writer: Writer):
+        """
+        Starts indexing the blocks of `writer`.
+        """
+        if self._writer is not None:
+            raise RuntimeError("The index is already attached to a writer!")
+        self._writer = writer
+        for name in ("_write", "_fill", "_open", "_close"):
+            # keep methods, which were already replaced on the object, e.g. by a profiler
+            self._saved[name] = writer.__dict__.get(name)
+        writer._write = self._count(writer._write)
+        writer._fill = self._backpatch(writer._fill)
+        writer._open = self._enter(writer._open)
+        writer._close = self._exit(writer._close)
+
+    def detach(self):
+        """
+        Stops indexing and restores the methods of the writer. Blocks left open by an exception end at the current
+        position.
+        """
+        for name, method in self._saved.items():
+            if method is None:
+                delattr(self._writer, name)
+            else:
+                setattr(self._writer, name, method)
+        self._saved.clear()
+        self._writer = None
+        while self._open:
+            self._finish(self._open.pop())
+
+    def path(self, i: int) -> tuple[str, ...]:
+        """
+        Gets the nesting path of a block.
+        :param i: int
+            Index of the block.
+        :return: tuple of str
+            First entry lines of all enclosing blocks and of the block itself.
+        """
+        path = []
+        while i >= 0:
+            path.append(self.names[i])
+            i = self.parents[i]
+        return tuple(reversed(path))
+
+    def save(self, path: str | os.PathLike):
+        """
+        Writes the index to a sidecar file.
+        """
+        encoding = self.encoding.encode()
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, len(self.names), len(encoding)))
+            file.write(encoding)
+            for name in _COLUMNS:
+                column = getattr(self, name)
+                if sys.byteorder == "big":
+                    column = array("q", column)
+                    column.byteswap()
+                column.tofile(file)
+            # first lines do not contain newline characters
+            file.write("\n".join(self.names).encode())
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> BlockIndex:
+        """
+        Reads an index from a sidecar file written by `save`.
+        :return: BlockIndex
+            Detached index.
+        """
+        with open(path, "rb") as file:
+            magic, version, count, encoding_length = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{os.fspath(path)!r} is not a block index of version {_VERSION}!")
+            index = cls(encoding=file.read(encoding_length).decode())
+            for name in _COLUMNS:
+                column = getattr(index, name)
+                column.fromfile(file, count)
+                if sys.byteorder == "big":
+                    column.byteswap()
+            names = file.read().decode()
+            index.names = names.split("\n") if count else []
+        return index
+
+    def _finish(self, i: int):
+        self.end_lines[i] = self._lines
+        self.end_bytes[i] = self._bytes
+
+    def _size(self, text: str) -> int:
+        return len(text) if text.isascii() else len(text.encode(self.encoding))
+
+    def _count(self, write: Callable) -> Callable:
+        @wraps(write)
+        def counting_write(text: str, flush=False):
+            self._lines += text.count("\n")
+            self._bytes += self._size(text)
+            write(text, flush)
+
+        return counting_write
+
+    def _backpatch(self, fill: Callable) -> Callable:
+        @wraps(fill)
+        def indexed_fill(index: int, text: str):
+            # everything after the slot was counted already and gets moved by the text of the placeholder
+            chunks = self._writer._chunks
+            position = self._bytes - sum(map(self._size, islice(chunks, index + 1, None)))
+            lines = text.count("\n")
+            size = self._size(text)
+            self._lines += lines
+            self._bytes += size
+            # blocks are ordered by their start, the ones starting before the placeholder may enclose it
+            first = bisect_left(self.start_bytes, position)
+            i = first - 1
+            while i >= 0:
+                if self.end_bytes[i] > position:
+                    self.end_lines[i] += lines
+                    self.end_bytes[i] += size
+                i = self.parents[i]
+            for i in range(first, len(self.names)):
+                self.start_lines[i] += lines
+                self.start_bytes[i] += size
+                if self.end_bytes[i] >= 0:
+                    self.end_lines[i] += lines
+                    self.end_bytes[i] += size
+            fill(index, text)
+
+        return indexed_fill
+
+    def _enter(self, open: Callable) -> Callable:
+        @wraps(open)
+        def indexed_open(block: Block):
+            self._open.append(len(self.names))
+            self.names.append(block.entry_line.split("\n", 1)[0])
+            self.parents.append(self._open[-2] if len(self._open) > 1 else -1)
+            self.start_lines.append(self._lines)
+            self.start_bytes.append(self._bytes)
+            self.end_lines.append(-1)
+            self.end_bytes.append(-1)
+            open(block)
+
+        return indexed_open
+
+    def _exit(self, close: Callable) -> Callable:
+        @wraps(close)
+        def indexed_close(block: Block):
+            close(block)
+            self._finish(self._open.pop())
+
+        return indexed_close
+
+
+class IndexedFile:
+    """
+    Random access to the blocks of a generated file by memory mapping it together with its `BlockIndex`.
+    """
+
+    def __init__(self, path: str | os.PathLike, index: BlockIndex | str | os.PathLike | None = None):
+        """
+        Create a new `IndexedFile` object.
+        :param path: str or path-like
+            Generated file.
+        :param index: BlockIndex, str or path-like, optional
+            Index or path of its sidecar file. Defaults to the path of the file with the additional extension '.idx'.
+        """
+        if index is None:
+            index = f"{os.fspath(path)}.idx"
+        if not isinstance(index, BlockIndex):
+            index = BlockIndex.load(index)
+        self.index = index
+        # lookup of the nesting paths, which gets built on demand
+        self._paths: dict[tuple[str, ...], int] | None = None
+        with open(path, "rb") as file:
+            # empty files cannot be mapped
+            if os.fstat(file.fileno()).st_size:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = b""
+
+    def __enter__(self) -> IndexedFile:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def close(self):
+        """
+        Unmaps the file.
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def find(self, *path: str) -> int:
+        """
+        Gets the index of the first block with the given nesting path.
+        :param path: str
+            First entry lines of all enclosing blocks and of the block itself.
+        :return: int
+            Index of the block.
+        """
+        if self._paths is None:
+            self._paths = {}
+            for i in range(len(self.index)):
+                self._paths.setdefault(self.index.path(i), i)
+        try:
+            return self._paths[path]
+        except KeyError:
+            raise KeyError(f"There is no block {' > '.join(path)!r}!") from None
+
+    def bytes(self, i: int) -> bytes:
+        """
+        Gets the encoded text of a block including its entry and exit line.
+        """
+        return self._data[self.index.start_bytes[i] : self.index.end_bytes[i]]
+
+    def text(self, i: int) -> str:
+        """
+        Gets the text of a block including its entry and exit line.
+        """
+        return self.bytes(i).decode(self.index.encoding)
+
+    def lines(self, i: int) -> range:
+        """
+        Gets the range of line numbers of a block counted from 0.
+        """
+        return range(self.index.start_lines[i], self.index.end_lines[i])
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import StringIO
+from typing import Any, Callable, Iterable, Mapping
+
+from .core import Writer, Node
+
+# a task gets a fresh writer and generates code with it, it has to be picklable (e.g. a module level function or a
+# `functools.partial` of one)
+Task = Callable[[Writer], Any]
+
+
+def generate_parallel(
+    tasks: Iterable[Task],
+    writer: Writer,
+    max_workers: int | None = None,
+    chunksize: int = 1,
+):
+    """
+    Runs independent generator tasks in a process pool and inserts their output into `writer` in the order of
+    `tasks` at the current indentation level of `writer`.
+    :param tasks: iterable of callables
+        Picklable callables, which get a new writer of the same type as `writer` as their only argument.
+    :param writer: Writer
+        Writer, which the results get written to. In deferred mode the recorded trees of the tasks get spliced.
+    :param max_workers: int, optional
+        Number of processes. Defaults to the number of processors.
+    :param chunksize: int, optional
+        Number of tasks, which are sent to a process at once. Larger values reduce the overhead for many small tasks.
+    """
+    deferred = writer.tree is not None
+    run = partial(
+        _generate,
+        type(writer),
+        writer.indentation,
+        writer.indentation_level,
+        deferred,
+    )
+    with ProcessPoolExecutor(max_workers) as executor:
+        # `map` yields the results in the order of the tasks as soon as they are available
+        for result in executor.map(run, tasks, chunksize=chunksize):
+            if deferred:
+                writer.splice(result)
+            else:
+                writer._inserted(result)
+                writer._write(result)
+
+
+def generate_files(
+    tasks: Mapping[str | os.PathLike, Task],
+    directory: str | os.PathLike = ".",
+    writer_cls: type[Writer] = Writer,
+    max_workers: int | None = None,
+    encoding: str = "utf-8",
+    **writer_kwargs,
+) -> list[str]:
+    """
+    Runs independent generator tasks in a process pool, each of which writes its own file.
+    :param tasks: mapping of paths to callables
+        Paths of the files relative to `directory` and picklable callables, which get a new writer writing to the
+        file as their only argument.
+    :param directory: str or path-like, optional
+        Directory, which the files are written to. Missing directories get created.
+    :param writer_cls: type, optional
+        Type of the writers, which get created.
+    :param max_workers: int, optional
+        Number of processes. Defaults to the number of processors.
+    :param encoding: str, optional
+        Encoding of the files.
+    :param writer_kwargs:
+        Further arguments for creating the writers, e.g. `indentation`.
+    :return: list of str
+        Paths of the written files in the order of `tasks`.
+    """
+    paths = [os.path.join(directory, path) for path in tasks]
+    run = partial(_generate_file, writer_cls, encoding, writer_kwargs)
+    with ProcessPoolExecutor(max_workers) as executor:
+        return list(executor.map(run, paths, tasks.values()))
+
+
+def _generate(
+    writer_cls: type[Writer], indentation: str, level: int, deferred: bool, task: Task
+) -> str | Node:
+    """
+    Runs a task inside a worker process and returns either the written text or the recorded tree.
+    """
+    if deferred:
+        writer = writer_cls(indentation=indentation, deferred=True)
+        task(writer)
+        _detach(writer.tree)
+        return writer.tree
+    file = StringIO()
+    writer = writer_cls(indentation=indentation, indentation_level=level, file=file)
+    task(writer)
+    return file.getvalue()
+
+
+def _generate_file(
+    writer_cls: type[Writer], encoding: str, writer_kwargs: dict, path: str, task: Task
+) -> str:
+    """
+    Runs a task inside a worker process, which writes the file at `path`.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding=encoding) as file:
+        with writer_cls(file=file, **{"buffer_size": 1 << 16, **writer_kwargs}) as writer:
+            task(writer)
+    return path
+
+
+def _detach(node: Node):
+    """
+    Removes the references of the recorded blocks to their writer, so that the tree can be sent between processes.
+    """
+    for child in node.children:
+        if isinstance(child, Node):
+            if child.block is not None:
+                child.block.writer = None
+            _detach(child)
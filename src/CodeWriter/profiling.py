@@ -0,0 +1,233 @@
+from __future__ import annotations
+import inspect
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterator
+
+from .core import Writer, Block
+
+# methods of the writer, which are replaced while a profiler is attached
+_HOOKS = ("_write", "_fill", "_open", "_close")
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of a `Writer`.
+
+    While attached, the profiler attributes wall time, number of calls, written lines and written bytes to every
+    block (keyed by the nesting path of their first entry lines or of user labels) and wall time and number of calls
+    to every public method of the writer. It works by replacing methods of the writer object only, so a writer
+    without a profiler runs without any overhead.
+
+    Lines and bytes are counted when text is written, so a writer in deferred mode only reports times. The text of a
+    placeholder (see `Writer.placeholder`) counts for the block, in which it is filled.
+    """
+
+    def __init__(self, writer: Writer | None = None):
+        """
+        Create a new `Profiler` object.
+        :param writer: Writer, optional
+            Writer, which the profiler gets attached to right away.
+        """
+        # nesting path -> [calls, seconds, lines, bytes], the times include the nested blocks
+        self.blocks: dict[tuple[str, ...], list] = {}
+        # method name -> [calls, seconds]
+        self.methods: dict[str, list] = {}
+        self._writer: Writer | None = None
+        self._saved: dict[str, Callable | None] = {}
+        self._path: tuple[str, ...] = ()
+        # stack of (path, start time) of the open blocks and labels
+        self._open: list[tuple[tuple[str, ...], float]] = []
+        if writer is not None:
+            self.attach(writer)
+
+    def attach(self, writer: Writer):
+        """
+        Starts profiling `writer`.
+        """
+        if self._writer is not None:
+            raise RuntimeError("The profiler is already attached to a writer!")
+        self._writer = writer
+        # the root path holds everything outside of blocks and the total time while attached
+        self._path = ()
+        self._push(type(writer).__name__)
+        names = [
+            name
+            for name, method in inspect.getmembers(type(writer), inspect.isfunction)
+            if not name.startswith("_") and not inspect.iscoroutinefunction(method)
+        ]
+        for name in (*_HOOKS, *names):
+            # keep methods, which were already replaced on the object, e.g. in deferred mode
+            self._saved[name] = writer.__dict__.get(name)
+        writer._write = self._count(writer._write)
+        writer._fill = self._count_fill(writer._fill)
+        writer._open = self._enter(writer._open)
+        writer._close = self._exit(writer._close)
+        for name in names:
+            setattr(writer, name, self._time(name, getattr(writer, name)))
+
+    def detach(self):
+        """
+        Stops profiling and restores the methods of the writer.
+        """
+        for name, method in self._saved.items():
+            if method is None:
+                delattr(self._writer, name)
+            else:
+                setattr(self._writer, name, method)
+        self._saved.clear()
+        self._writer = None
+        # close the root and any labels or blocks left open by an exception
+        while self._open:
+            self._pop()
+
+    @contextmanager
+    def label(self, name: str) -> Iterator[None]:
+        """
+        Attributes everything inside the `with` statement to a user defined label nested in the current block.
+        """
+        self._push(name)
+        try:
+            yield
+        finally:
+            self._pop()
+
+    def _stats(self, path: tuple[str, ...]) -> list:
+        try:
+            return self.blocks[path]
+        except KeyError:
+            stats = self.blocks[path] = [0, 0.0, 0, 0]
+            return stats
+
+    def _push(self, name: str):
+        self._path = (*self._path, name)
+        self._open.append((self._path, perf_counter()))
+
+    def _pop(self):
+        path, start = self._open.pop()
+        stats = self._stats(path)
+        stats[0] += 1
+        stats[1] += perf_counter() - start
+        self._path = path[:-1]
+
+    def _add(self, text: str):
+        stats = self._stats(self._path)
+        stats[2] += text.count("\n")
+        stats[3] += len(text) if text.isascii() else len(text.encode())
+
+    def _count(self, write: Callable) -> Callable:
+        @wraps(write)
+        def counting_write(text: str, flush=False):
+            self._add(text)
+            write(text, flush)
+
+        return counting_write
+
+    def _count_fill(self, fill: Callable) -> Callable:
+        @wraps(fill)
+        def counting_fill(index: int, text: str):
+            self._add(text)
+            fill(index, text)
+
+        return counting_fill
+
+    def _enter(self, open: Callable) -> Callable:
+        @wraps(open)
+        def timed_open(block: Block):
+            self._push(block.entry_line.split("\n", 1)[0])
+            open(block)
+
+        return timed_open
+
+    def _exit(self, close: Callable) -> Callable:
+        @wraps(close)
+        def timed_close(block: Block):
+            close(block)
+            self._pop()
+
+        return timed_close
+
+    def _time(self, name: str, method: Callable) -> Callable:
+        stats = self.methods[name] = self.methods.get(name, [0, 0.0])
+
+        @wraps(method)
+        def timed_method(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats[0] += 1
+                stats[1] += perf_counter() - start
+
+        return timed_method
+
+    def _total_times(self) -> dict[tuple[str, ...], float]:
+        """
+        Gets the time spent in every block including the time of the blocks, which are still open.
+        """
+        times = {path: stats[1] for path, stats in self.blocks.items()}
+        now = perf_counter()
+        for path, start in self._open:
+            times[path] += now - start
+        return times
+
+    def _self_times(self, total_times: dict[tuple[str, ...], float]) -> dict[tuple[str, ...], float]:
+        """
+        Gets the time spent in every block without its nested blocks.
+        """
+        times = total_times.copy()
+        for path, time in total_times.items():
+            if len(path) > 1:
+                times[path[:-1]] -= time
+        return times
+
+    def report(self) -> str:
+        """
+        Creates a flat report of all blocks and methods, sorted by their time without nested blocks.
+        :return: str
+            Report as a table.
+        """
+        total_times = self._total_times()
+        self_times = self._self_times(total_times)
+        lines = [f"{'self [s]':>10} {'total [s]':>10} {'calls':>8} {'lines':>10} {'bytes':>12}  block"]
+        for path in sorted(self.blocks, key=self_times.get, reverse=True):
+            calls, _, line_count, byte_count = self.blocks[path]
+            lines.append(
+                f"{self_times[path]:>10.4f} {total_times[path]:>10.4f} {calls:>8} {line_count:>10} {byte_count:>12}  "
+                + " > ".join(path)
+            )
+        lines.append("")
+        lines.append(f"{'total [s]':>10} {'calls':>8}  method")
+        for name, (calls, seconds) in sorted(self.methods.items(), key=lambda item: -item[1][1]):
+            if calls:
+                lines.append(f"{seconds:>10.4f} {calls:>8}  {name}")
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self, metric: str = "time") -> str:
+        """
+        Exports the blocks in the collapsed stack format used by flame graph tools (e.g. flamegraph.pl or
+        speedscope).
+        :param metric: str, optional
+            One of 'time' (in microseconds without nested blocks), 'lines' or 'bytes'.
+        :return: str
+            One line per block with the semicolon separated path and the value.
+        """
+        if metric == "time":
+            values = {path: round(time * 1e6) for path, time in self._self_times(self._total_times()).items()}
+        elif metric in ("lines", "bytes"):
+            index = 2 if metric == "lines" else 3
+            values = {path: stats[index] for path, stats in self.blocks.items()}
+        else:
+            raise ValueError(f"Unknown metric '{metric}', use 'time', 'lines' or 'bytes'!")
+        return "".join(
+            ";".join(name.replace(";", ",") for name in path) + f" {value}\n"
+            for path, value in values.items()
+            if value > 0
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detach()
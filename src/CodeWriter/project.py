@@ -0,0 +1,145 @@
+from __future__ import annotations
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+from typing import Iterator
+
+from .FortranWriter import FortranWriter
+from .sinks import UpdateFile
+
+
+class FortranProject:
+    """
+    Writes every Fortran module into its own file and records the dependencies between the modules given by the
+    `use` statements of `FortranWriter.use`, spliced fragments, filled placeholders and the results of
+    `generate_parallel`. Use statements printed with other methods of the writer, e.g. `print`, are not tracked. Upon
+    closing, a build manifest with the modules grouped into levels, which can be compiled in parallel, and a Makefile
+    fragment with the dependencies of the object files are written.
+
+    Files are written in a thread pool and only replaced, if their content changed (see `UpdateFile`).
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike = ".",
+        extension: str = ".f90",
+        manifest: str | None = "modules.json",
+        makefile: str | None = "modules.mk",
+        max_workers: int | None = None,
+        **writer_kwargs,
+    ):
+        """
+        Create a new `FortranProject` object.
+        :param directory: str or path-like, optional
+            Directory of the generated files.
+        :param extension: str, optional
+            Extension of the source files.
+        :param manifest: str, optional
+            Name of the JSON manifest or None for not writing it.
+        :param makefile: str, optional
+            Name of the Makefile fragment or None for not writing it.
+        :param max_workers: int, optional
+            Number of threads writing files.
+        :param writer_kwargs:
+            Further arguments for creating the writers, e.g. `indentation`.
+        """
+        self.directory = os.fspath(directory)
+        self.extension = extension
+        self.manifest = manifest
+        self.makefile = makefile
+        self.writer_kwargs = writer_kwargs
+        # modules used by every module of the project in the order of generation
+        self.dependencies: dict[str, list[str]] = {}
+        self.changed: list[str] = []
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._futures: list[Future] = []
+
+    @contextmanager
+    def module(self, name: str) -> Iterator[FortranWriter]:
+        """
+        Creates a module in its own file.
+        :param name: str
+            Name of the module and the file.
+        :return: FortranWriter
+            Writer inside the module block for use in a `with` statement.
+        """
+        name = name.lower()
+        if name in self.dependencies:
+            raise ValueError(f"The module '{name}' was already written!")
+        file = StringIO()
+        writer = FortranWriter(file=file, **self.writer_kwargs)
+        with writer.module(name):
+            yield writer
+        self.dependencies[name] = writer.used_modules
+        self._futures.append(
+            self._executor.submit(self._write, f"{name}{self.extension}", file.getvalue())
+        )
+
+    def _write(self, name: str, text: str) -> tuple[str, bool]:
+        with UpdateFile(os.path.join(self.directory, name)) as file:
+            file.write(text)
+        return file.path, file.changed
+
+    def levels(self) -> list[list[str]]:
+        """
+        Groups the modules into levels, such that every module only depends on modules of previous levels. All
+        modules of one level can be compiled in parallel. Modules outside of the project are ignored.
+        :return: list of list of str
+            Names of the modules of every level.
+        """
+        remaining = {
+            name: {module for module in used if module in self.dependencies and module != name}
+            for name, used in self.dependencies.items()
+        }
+        levels = []
+        while remaining:
+            level = [name for name, used in remaining.items() if not used]
+            if not level:
+                raise ValueError(f"The modules {', '.join(sorted(remaining))} have cyclic dependencies!")
+            for name in level:
+                del remaining[name]
+            for used in remaining.values():
+                used.difference_update(level)
+            levels.append(level)
+        return levels
+
+    def close(self) -> list[str]:
+        """
+        Waits for all files to be written and writes the manifest and the Makefile fragment.
+        :return: list of str
+            Paths of all files, whose content changed.
+        """
+        for future in self._futures:
+            path, changed = future.result()
+            if changed:
+                self.changed.append(path)
+        self._futures.clear()
+        self._executor.shutdown()
+        if self.manifest is not None:
+            manifest = {
+                "levels": self.levels(),
+                "dependencies": self.dependencies,
+                "files": {name: f"{name}{self.extension}" for name in self.dependencies},
+            }
+            self._write(self.manifest, json.dumps(manifest, indent=2) + "\n")
+        if self.makefile is not None:
+            self._write(self.makefile, self._makefile())
+        return self.changed
+
+    def _makefile(self) -> str:
+        lines = ["# dependencies of the generated Fortran modules"]
+        for name, used in self.dependencies.items():
+            objects = [f"{module}.o" for module in used if module in self.dependencies and module != name]
+            lines.append(f"{name}.o: {name}{self.extension} {' '.join(objects)}".rstrip())
+        return "\n".join(lines) + "\n"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown()
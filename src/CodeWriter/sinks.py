@@ -0,0 +1,359 @@
+from __future__ import annotations
+import bz2
+import gzip
+import hashlib
+import lzma
+import os
+import secrets
+import subprocess
+from typing import BinaryIO, Sequence
+
+# number of bytes read at once when hashing an existing file
+_READ_SIZE = 1 << 20
+
+
+class Sink:
+    """
+    Base class for file-like objects, which can be used as the `file` of a `Writer`. The written text is collected
+    and encoded in large chunks, which are passed to `write_bytes`. By default they are written to a binary stream,
+    which is owned by the sink and closed together with it.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO | None = None,
+        encoding: str = "utf-8",
+        buffer_size: int = 1 << 20,
+    ):
+        """
+        Create a new `Sink` object.
+        :param stream: binary file object, optional
+            Stream, which the encoded text gets written to. Subclasses, which override `write_bytes`, may not need
+            it.
+        :param encoding: str, optional
+            Encoding of the text.
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get encoded and written.
+        """
+        self.stream = stream
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        self.closed = False
+        self._chunks: list[str] = []
+        self._buffered = 0
+
+    def write(self, text: str) -> int:
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self._write_chunks()
+        return len(text)
+
+    def _write_chunks(self):
+        if self._chunks:
+            self.write_bytes("".join(self._chunks).encode(self.encoding))
+            self._chunks.clear()
+            self._buffered = 0
+
+    def write_bytes(self, data: bytes):
+        """
+        Writes encoded text.
+        """
+        self.stream.write(data)
+
+    def flush(self):
+        self._write_chunks()
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            if self.stream is not None:
+                self.stream.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CompressedSink(Sink):
+    """
+    Sink, which writes a compressed file.
+    """
+
+    _openers = {"gzip": gzip.open, "bz2": bz2.open, "lzma": lzma.open}
+    _extensions = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma", ".lzma": "lzma"}
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        method: str | None = None,
+        encoding: str = "utf-8",
+        buffer_size: int = 1 << 20,
+        **kwargs,
+    ):
+        """
+        Create a new `CompressedSink` object.
+        :param path: str or path-like
+            Path of the compressed file.
+        :param method: str, optional
+            One of 'gzip', 'bz2' or 'lzma'. Defaults to the method matching the extension of `path`.
+        :param encoding: str, optional
+            Encoding of the text.
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get encoded, compressed and written.
+        :param kwargs:
+            Further arguments for the `open` function of the compression module, e.g. `compresslevel` or `preset`.
+        """
+        if method is None:
+            method = self._extensions.get(os.path.splitext(path)[1])
+            if method is None:
+                raise ValueError(f"The compression method can not be derived from '{path}'!")
+        try:
+            opener = self._openers[method]
+        except KeyError:
+            raise ValueError(
+                f"Unknown compression method '{method}', use one of {', '.join(self._openers)}!"
+            )
+        super().__init__(opener(path, "wb", **kwargs), encoding, buffer_size)
+
+
+class TeeSink(Sink):
+    """
+    Sink, which encodes the text once and writes it to several targets.
+    """
+
+    def __init__(
+        self,
+        *targets: Sink | BinaryIO,
+        encoding: str = "utf-8",
+        buffer_size: int = 1 << 20,
+    ):
+        """
+        Create a new `TeeSink` object.
+        :param targets: Sink or binary file object
+            Targets, which get the encoded text. Sinks get it without encoding it again. All targets are closed
+            together with the tee.
+        :param encoding: str, optional
+            Encoding of the text.
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get encoded and written.
+        """
+        super().__init__(None, encoding, buffer_size)
+        self.targets = targets
+        self._writers = [
+            target.write_bytes if isinstance(target, Sink) else target.write
+            for target in targets
+        ]
+
+    def write_bytes(self, data: bytes):
+        for write in self._writers:
+            write(data)
+
+    def flush(self):
+        super().flush()
+        for target in self.targets:
+            target.flush()
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            for target in self.targets:
+                target.close()
+
+
+class PipeSink(Sink):
+    """
+    Sink, which writes to the standard input of a new process, e.g. a compiler reading its source from stdin.
+    """
+
+    def __init__(
+        self,
+        args: str | Sequence[str],
+        encoding: str = "utf-8",
+        buffer_size: int = 1 << 20,
+        check: bool = True,
+        **kwargs,
+    ):
+        """
+        Create a new `PipeSink` object and start the process.
+        :param args: str or sequence of str
+            Command, see `subprocess.Popen`.
+        :param encoding: str, optional
+            Encoding of the text.
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get encoded and written.
+        :param check: bool, optional
+            Whether a `subprocess.CalledProcessError` should be raised upon closing, if the process failed.
+        :param kwargs:
+            Further arguments for `subprocess.Popen`, e.g. `stdout` or `cwd`.
+        """
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, **kwargs)
+        self.check = check
+        super().__init__(self.process.stdin, encoding, buffer_size)
+
+    def close(self) -> int:
+        """
+        Closes the standard input of the process and waits for it to finish.
+        :return: int
+            Return code of the process.
+        """
+        if not self.closed:
+            super().close()
+            self.process.wait()
+            if self.check and self.process.returncode:
+                raise subprocess.CalledProcessError(self.process.returncode, self.process.args)
+        return self.process.returncode
+
+
+class UpdateFile(Sink):
+    """
+    File-like object for use as the `file` of a `Writer`, which only replaces the file at `path` if the generated
+    content differs from the existing one. This keeps the modification time of unchanged files, so that build tools
+    do not rebuild them.
+
+    The text gets written to a temporary file next to `path` while its hash is computed. Upon closing, the hash is
+    compared with the one of the existing file and the temporary file either atomically replaces it or is removed.
+    The writer has to be closed or flushed before the file is closed.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        encoding: str = "utf-8",
+        buffer_size: int = 1 << 20,
+    ):
+        """
+        Create a new `UpdateFile` object.
+        :param path: str or path-like
+            Path of the file, which gets updated. Missing directories get created.
+        :param encoding: str, optional
+            Encoding of the file.
+        :param buffer_size: int, optional
+            Number of characters, which are collected before they get encoded and written.
+        """
+        self.path = os.fspath(path)
+        # None as long as the file is not closed
+        self.changed: bool | None = None
+        directory, name = os.path.split(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._temporary = os.path.join(directory, f".{name}.{secrets.token_hex(4)}.tmp")
+        self._hash = hashlib.sha256()
+        self._size = 0
+        # the file is created like a normal file, such that it gets the default permissions
+        super().__init__(open(self._temporary, "xb"), encoding, buffer_size)
+
+    def write_bytes(self, data: bytes):
+        self._hash.update(data)
+        self._size += len(data)
+        self.stream.write(data)
+
+    def close(self) -> bool:
+        """
+        Replaces the file at `path`, if the content changed, and removes the temporary file otherwise.
+        :return: bool
+            Whether the file was changed.
+        """
+        if self.changed is not None:
+            return self.changed
+        super().close()
+        self.changed = not self._same_content()
+        if self.changed:
+            os.replace(self._temporary, self.path)
+        else:
+            os.remove(self._temporary)
+        return self.changed
+
+    def discard(self):
+        """
+        Removes the temporary file and leaves the file at `path` untouched.
+        """
+        if self.changed is None:
+            self.stream.close()
+            self.closed = True
+            os.remove(self._temporary)
+            self.changed = False
+
+    def _same_content(self) -> bool:
+        try:
+            if os.path.getsize(self.path) != self._size:
+                return False
+            file_hash = hashlib.sha256()
+            with open(self.path, "rb") as file:
+                while data := file.read(_READ_SIZE):
+                    file_hash.update(data)
+        except FileNotFoundError:
+            return False
+        return file_hash.digest() == self._hash.digest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # keep the old file, if the generation failed
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class FileUpdater:
+    """
+    Creates `UpdateFile` objects for several files of one generation run and reports which of them changed.
+    """
+
+    def __init__(self, directory: str | os.PathLike = ".", encoding: str = "utf-8"):
+        """
+        Create a new `FileUpdater` object.
+        :param directory: str or path-like, optional
+            Directory, which relative paths are resolved against.
+        :param encoding: str, optional
+            Encoding of the files.
+        """
+        self.directory = os.fspath(directory)
+        self.encoding = encoding
+        self.files: list[UpdateFile] = []
+
+    def open(self, path: str | os.PathLike) -> UpdateFile:
+        """
+        Creates a new `UpdateFile` for `path` relative to `directory`.
+        """
+        file = UpdateFile(os.path.join(self.directory, path), self.encoding)
+        self.files.append(file)
+        return file
+
+    def close(self):
+        """
+        Closes all files, which are still open.
+        """
+        for file in self.files:
+            file.close()
+
+    @property
+    def changed(self) -> list[str]:
+        """
+        Paths of all closed files, whose content changed.
+        """
+        return [file.path for file in self.files if file.changed]
+
+    @property
+    def unchanged(self) -> list[str]:
+        """
+        Paths of all closed files, whose content stayed the same.
+        """
+        return [file.path for file in self.files if file.changed is False]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for file in self.files:
+                file.discard()
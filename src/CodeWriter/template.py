@@ -0,0 +1,123 @@
+from __future__ import annotations
+import re
+from io import StringIO
+from typing import Any, Callable, TextIO
+
+from .core import Writer
+
+# occurrences of parameters in the output are recorded as markers, which can not appear in normal text
+_MARKER = "\x00{}\x00"
+_MARKER_PATTERN = re.compile("\x00(\\d+)\x00")
+# parameters are passed to the script as markers with a suffix, which gets changed, if a writer method escapes,
+# quotes, splits or changes the case of its arguments before printing them, text added after the newline (e.g. by
+# `FortranWriter.comment`) only restricts the parameter to single lines
+_SUFFIX = "x_%&$#'\"\\"
+_PARAMETER = "\x00{}" + _SUFFIX + "\n\x00"
+_PARAMETER_PATTERN = re.compile("\x00(\\d+)" + re.escape(_SUFFIX) + "\n([^\x00\n]*)\x00")
+
+
+class Template:
+    """
+    Writer script compiled into a fast renderer with named parameters.
+
+    The script is run once with markers instead of the parameter values. Its output gets split into literal chunks
+    and slots for the parameters, such that rendering new values only joins strings and is independent of the
+    complexity of the script. Parameters can be used in the text, which gets printed, e.g. in f-strings or as
+    arguments of blocks, but the control flow of the script must not depend on them. Writer methods, which change
+    their arguments before printing them, e.g. the escaping of `LatexWriter.tabular` or the comment characters of
+    `FortranWriter.comment` for multi-line comments, can not be used with parameters. Changed parameters raise a
+    ValueError while recording, parameters restricted to a single line while rendering.
+    """
+
+    def __init__(
+        self,
+        script: Callable[..., Any],
+        *parameters: str,
+        writer_cls: type[Writer] = Writer,
+        indentation: str = " " * 4,
+        indentation_level: int = 0,
+    ):
+        """
+        Records a script and compiles it.
+        :param script: callable
+            Gets a writer as positional argument and every parameter as keyword argument.
+        :param parameters: str
+            Names of the parameters.
+        :param writer_cls: type, optional
+            Type of the writer, which is passed to the script.
+        :param indentation: str, optional
+            String, which is used for indenting.
+        :param indentation_level: int, optional
+            Starting indentation level.
+        """
+        self.parameters = parameters
+        file = StringIO()
+        writer = writer_cls(indentation=indentation, indentation_level=indentation_level, file=file)
+        # name of the parameter and replacement of newline characters in its value for every marker in the output, None
+        # if the value must not contain newline characters
+        self._slots: list[tuple[int, str, str | None]] = []
+        occurrences: list[tuple[str, str | None]] = []
+        emit = writer._emit
+
+        def number(text: str, newline: str) -> str:
+            # give every occurrence of a parameter its own marker, since the newlines depend on where it is written
+            def occurrence(match: re.Match) -> str:
+                occurrences.append((parameters[int(match.group(1))], None if match.group(2) else newline))
+                return _MARKER.format(len(occurrences) - 1)
+
+            return _PARAMETER_PATTERN.sub(occurrence, text) if "\x00" in text else text
+
+        def recording_emit(text: str, end: str = "\n", flush=False, doubled=False):
+            # newlines in values get the same indentation as the other newlines in the text, `end` is not indented
+            level = writer.indentation_level
+            text = number(text, writer._newline(2 * level if doubled else level))
+            emit(text, number(end, "\n"), flush, doubled)
+
+        writer._emit = recording_emit
+        script(writer, **{name: _PARAMETER.format(i) for i, name in enumerate(parameters)})
+        writer.close()
+        parts = _MARKER_PATTERN.split(file.getvalue())
+        # `split` alternates between literal text and the indices of the occurrences
+        self._chunks = parts
+        for position in range(0, len(parts), 2):
+            if "\x00" in parts[position]:
+                raise ValueError(
+                    "A parameter was changed by the writer before it was printed, which can not be rendered later!"
+                )
+        for position in range(1, len(parts), 2):
+            self._slots.append((position, *occurrences[int(parts[position])]))
+            parts[position] = ""
+
+    def render(self, **values: Any) -> str:
+        """
+        Renders the template.
+        :param values:
+            Value for every parameter, which gets converted with `str`.
+        :return: str
+            Generated text.
+        """
+        chunks = self._chunks.copy()
+        for position, name, newline in self._slots:
+            value = str(values[name])
+            if "\n" in value:
+                if newline is None:
+                    raise ValueError(f"The parameter '{name}' can not contain newline characters at this place!")
+                value = value.replace("\n", newline)
+            chunks[position] = value
+        return "".join(chunks)
+
+    def write(self, file: TextIO | Writer, **values: Any):
+        """
+        Renders the template and writes it.
+        :param file: object or Writer
+            File or writer, which the text gets written to. The text is written unchanged, so a writer should be at
+            the same indentation level as the template.
+        :param values:
+            Value for every parameter, which gets converted with `str`.
+        """
+        text = self.render(**values)
+        if isinstance(file, Writer):
+            file._inserted(text)
+            file._write(text)
+        else:
+            file.write(text)
@@ -1,5 +1,9 @@
+import importlib
+from array import array
 from io import StringIO
 
+import pytest
+
 from CodeWriter import FortranWriter
 
 
@@ -60,3 +64,215 @@ contains
 end module my_module
 """
     )
+
+
+def test_fragment():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    body = writer.fragment()
+    body.declare("real", "x", intent="in")
+    with body.if_then("x > 0"):
+        body.print("call work(x)")
+
+    with writer.module("my_module"):
+        writer.contains()
+        with writer.subroutine("my_routine", "x", trailing=False):
+            writer.splice(body)
+    writer.splice(body)
+    assert (
+        buffer.getvalue()
+        == """\
+module my_module
+contains
+    subroutine my_routine(x)
+        real, intent(in) :: x
+        if (x > 0) then
+            call work(x)
+        end if
+    end subroutine my_routine
+end module my_module
+real, intent(in) :: x
+if (x > 0) then
+    call work(x)
+end if
+"""
+    )
+
+
+def test_array_constant():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with writer.module("constants"):
+        writer.array_constant("c", [0.1, 1e-5, 3, 2.5e300] * 10)
+        writer.array_constant("i", array("i", range(3)), "integer", parameter=False)
+        writer.array_constant("k", [1.5, 2e-3], "real(dp)", kind="dp")
+    lines = buffer.getvalue().splitlines()
+    assert max(map(len, lines)) <= 132
+    assert lines[:2] == [
+        "module constants",
+        "    real(8), parameter :: c(40) = [ &",
+    ]
+    assert lines[2].startswith("        0.1d0, 1d-05, 3.0d0, 2.5d+300, 0.1d0,")
+    assert lines[2].endswith(", &")
+    assert lines[-7].endswith("3.0d0, 2.5d+300]")
+    assert lines[-6:] == [
+        "    integer :: i(3)",
+        "    data i / &",
+        "        0, 1, 2 /",
+        "    real(dp), parameter :: k(2) = [ &",
+        "        1.5_dp, 0.002_dp]",
+        "end module constants",
+    ]
+
+
+def test_array_constant_reshape():
+    numpy = pytest.importorskip("numpy")
+    values = numpy.full(52, 10)
+    values[-32:] = 100
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with writer.module("constants"):
+        writer.array_constant("c", values.reshape(13, 4), "integer")
+        writer.array_constant("l", numpy.array([True, False]), "logical")
+        writer.array_constant("m", [False, True], "logical", parameter=False)
+        with pytest.raises(ValueError):
+            writer.array_constant("x", [True], "real(8)")
+    lines = buffer.getvalue().splitlines()
+    # the last line of the reshaped array has to fit including the longer end
+    assert max(map(len, lines)) <= 132
+    assert lines[1] == "    integer, parameter :: c(13, 4) = reshape([ &"
+    assert lines[4] == "        100], [13, 4])"
+    assert ", ".join(line.strip().removesuffix(", &") for line in lines[2:5]) == (
+        ", ".join(map(str, values.reshape(13, 4).ravel("F"))) + "], [13, 4])"
+    )
+    assert lines[5:10] == [
+        "    logical, parameter :: l(2) = [ &",
+        "        .true., .false.]",
+        "    logical :: m(2)",
+        "    data m / &",
+        "        .false., .true. /",
+    ]
+
+
+def read_array_constant(text: str, numpy) -> dict:
+    """
+    Evaluates the statements written by `array_constant`.
+    """
+    arrays = {}
+    statements = text.replace("&\n", "").splitlines()
+    for statement in statements:
+        statement = " ".join(statement.split())
+        if statement.startswith("data "):
+            target, items = statement[5:].split(" / ", 1)
+            name, subscripts = target[:-1].split("(")
+            items = items[:-2].split(", ")
+            index = tuple(
+                slice(None)
+                if subscript == ":"
+                else slice(int(subscript.split(":")[0]) - 1, int(subscript.split(":")[1]))
+                if ":" in subscript
+                else int(subscript) - 1
+                for subscript in subscripts.split(", ")
+            )
+            target = arrays[name][index]
+            arrays[name][index] = numpy.array(items, dtype=int).reshape(numpy.shape(target), order="F")
+        elif " :: " in statement:
+            declaration = statement.split(" :: ")[1]
+            name, rest = declaration.split("(", 1)
+            shape = tuple(map(int, rest.split(")")[0].split(", ")))
+            if " = " not in declaration:
+                arrays[name] = numpy.zeros(shape, dtype=int)
+                continue
+            items = declaration.split("[", 1)[1].split("]")[0].strip().split(", ")
+            values = numpy.concatenate(
+                [numpy.ravel(arrays[item], "F") if item in arrays else [int(item)] for item in items]
+            )
+            arrays[name] = values.reshape(shape, order="F")
+    return arrays
+
+
+def test_array_constant_statements(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    writer.array_constant("big", numpy.linspace(0, 1, 20000))
+    lines = buffer.getvalue().splitlines()
+    statements = buffer.getvalue().replace("&\n", "\0").splitlines()
+    assert len(statements) > 1
+    assert max(statement.count("\0") for statement in statements) <= 255
+    assert max(map(len, lines)) <= 132
+
+    # few continuation lines, such that the parts get grouped and data statements need sections
+    monkeypatch.setattr(importlib.import_module("CodeWriter.FortranWriter"), "_CONTINUATION_LINES", 3)
+    values = numpy.arange(1000, 1000 + 13 * 4 * 3).reshape(13, 4, 3)
+    for parameter in (True, False):
+        buffer = StringIO()
+        writer = FortranWriter(file=buffer)
+        writer.array_constant("c", values, "integer", parameter=parameter, line_length=40)
+        statements = buffer.getvalue().replace("&\n", "\0").splitlines()
+        assert len(statements) > 10
+        assert max(statement.count("\0") for statement in statements) <= 3
+        assert (read_array_constant(buffer.getvalue(), numpy)["c"] == values).all()
+
+
+def test_loops():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with writer.subroutine("kernel", "a", "n", trailing=False):
+        with writer.omp_parallel_do(
+            "j", "1", "n", private=["i", "t"], reduction=["+:total"], schedule="static"
+        ):
+            with writer.omp_simd("i", "1", "n", reduction=["max:m"]):
+                writer.print("t = a(i, j)")
+            with writer.do("i", "n", "1", "-1"):
+                writer.print("a(i, j) = 0")
+        with writer.do_concurrent("i = 1:n", "j = 1:n", mask="i /= j"):
+            writer.print("a(i, j) = 1")
+    assert (
+        buffer.getvalue()
+        == """\
+subroutine kernel(a, n)
+    !$omp parallel do private(i, t) reduction(+:total) schedule(static)
+    do j = 1, n
+        !$omp simd reduction(max:m)
+        do i = 1, n
+            t = a(i, j)
+        end do
+        !$omp end simd
+        do i = n, 1, -1
+            a(i, j) = 0
+        end do
+    end do
+    !$omp end parallel do
+    do concurrent (i = 1:n, j = 1:n, i /= j)
+        a(i, j) = 1
+    end do
+end subroutine kernel
+"""
+    )
+
+
+def test_unrolled_do():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    writer.unrolled_do("i", "1", "n", lambda i: writer.print(f"a({i}) = 0"), factor=2)
+    writer.unrolled_do("i", 10, 1, lambda i: writer.print(f"b({i}) = 0"), factor=3, step=-2)
+    assert (
+        buffer.getvalue()
+        == """\
+do i = 1, n - 1, 2
+    a(i) = 0
+    a(i + 1) = 0
+end do
+do i = 1 + (n - 1 + 1) / 2 * 2, n
+    a(i) = 0
+end do
+do i = 10, 10, -6
+    b(i) = 0
+    b(i - 2) = 0
+    b(i - 4) = 0
+end do
+b(4) = 0
+b(2) = 0
+"""
+    )
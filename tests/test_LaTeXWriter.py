@@ -38,3 +38,61 @@ def test_LatexWriter():
     \end{environment}
 \end{document}
 """
+
+
+def test_tabular():
+    buffer = StringIO()
+    writer = LatexWriter(file=buffer)
+    rows = ((f"row_{i}", i / 4, i) for i in range(3))
+    writer.tabular(rows, "lrr", header=["name", "$x$", "#"], formats=[None, "%.2f", None])
+    writer.longtable([["50%", "{a}"]], "ll", caption="Results")
+    assert (
+        buffer.getvalue()
+        == r"""\begin{tabular}{lrr}
+    name & \$x\$ & \# \\
+    \hline
+    row\_0 & 0.00 & 0 \\
+    row\_1 & 0.25 & 1 \\
+    row\_2 & 0.50 & 2 \\
+\end{tabular}
+\begin{longtable}{ll}
+    \caption{Results} \\
+    50\% & \{a\} \\
+\end{longtable}
+"""
+    )
+
+
+def generate_report(directory, results: str):
+    buffer = StringIO()
+    with LatexWriter(file=buffer) as writer:
+        writer.print(r"\documentclass{report}")
+        writer.include_only(directory=directory)
+        with writer.environment("document"):
+            with writer.include("introduction", directory) as part:
+                part.print(r"\chapter{Introduction}")
+            with writer.include("results", directory) as part:
+                with part.itemize():
+                    part.item(results)
+    return writer, buffer.getvalue()
+
+
+def test_include(tmp_path):
+    writer, main = generate_report(tmp_path, "first")
+    assert main == (
+        "\\documentclass{report}\n"
+        "\\input{includeonly}\n"
+        "\\begin{document}\n"
+        "    \\include{introduction}\n"
+        "    \\include{results}\n"
+        "\\end{document}\n"
+    )
+    assert writer.parts == {"introduction": True, "results": True}
+    assert (tmp_path / "results.tex").read_text() == (
+        "\\begin{itemize}\n    \\item first\n\\end{itemize}\n"
+    )
+    assert (tmp_path / "includeonly.tex").read_text() == "\\includeonly{introduction,results}\n"
+
+    writer, _ = generate_report(tmp_path, "second")
+    assert writer.parts == {"introduction": False, "results": True}
+    assert (tmp_path / "includeonly.tex").read_text() == "\\includeonly{results}\n"
@@ -1,7 +1,17 @@
+import importlib
+import linecache
+import os
+import traceback
+from array import array
 from io import StringIO
 
+import pytest
+
 from CodeWriter import PythonWriter
 
+# the module is shadowed by the class of the same name in the package
+PythonWriter_module = importlib.import_module("CodeWriter.PythonWriter")
+
 
 def test_PythonWriter():
     buffer = StringIO()
@@ -43,3 +53,87 @@ def main():
  
 """
     )
+
+
+def test_array_literal():
+    values = [0.1, 1e-300, float("inf"), 3] * 30
+    buffer = StringIO()
+    writer = PythonWriter(file=buffer)
+    writer.array_literal("values", values)
+    writer.array_literal("empty", array("d"))
+    lines = buffer.getvalue().splitlines()
+    assert max(map(len, lines)) <= 88
+    assert lines[0] == "values = ["
+    assert lines[1].startswith('    0.1, 1e-300, float("inf"), 3, 0.1,')
+    assert lines[-2:] == ["empty = [", "]"]
+
+    namespace = {}
+    exec(buffer.getvalue(), namespace)
+    assert namespace["values"] == values
+    assert namespace["empty"] == []
+
+
+def generate_kernel(writer: PythonWriter, factor: int):
+    with writer.function("kernel", "x"):
+        with writer.if_statement("x < 0"):
+            writer.print("raise ValueError('negative')")
+        writer.print(f"return {factor} * x")
+
+
+def test_load_module(tmp_path):
+    writer = PythonWriter(file=StringIO())
+    generate_kernel(writer, 3)
+    module = writer.load_module("kernel", cache_dir=tmp_path)
+    assert module.kernel(2) == 6
+    with pytest.raises(ValueError) as error:
+        module.kernel(-1)
+    assert traceback.extract_tb(error.tb)[-1].line == "raise ValueError('negative')"
+    assert len(os.listdir(tmp_path)) == 1
+
+    # identical code is taken from the in-memory cache and then from the disk cache
+    writer = PythonWriter(deferred=True)
+    generate_kernel(writer, 3)
+    assert writer.load_module("other").kernel.__code__ is module.kernel.__code__
+    PythonWriter_module._code_cache.clear()
+    assert writer.load_module("other", cache_dir=tmp_path).kernel(1) == 3
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_unrolled_range_loop():
+    writer = PythonWriter(file=StringIO())
+    with writer.function("kernel", "start", "stop", "values"):
+        for step in (1, 2, 3):
+            for factor in (1, 3, 4):
+                writer.unrolled_range_loop(
+                    "i", "start", "stop", lambda i: writer.print(f"values.append(({i}, {step}))"), factor, step
+                )
+    module = PythonWriter_module.load_source(writer.file.getvalue(), "unrolled")
+    for start, stop in ((0, 0), (0, 1), (2, 13), (5, 2), (-3, 8)):
+        values = []
+        module.kernel(start, stop, values)
+        assert values == [(i, step) for step in (1, 2, 3) for factor in (1, 3, 4) for i in range(start, stop, step)]
+
+    for start, stop, step in ((0, 10, 1), (10, 0, -3), (0, 3, 1), (4, 4, 1)):
+        for factor in (None, 4):
+            values = []
+            writer = PythonWriter(file=StringIO())
+            with writer.function("kernel", "values"):
+                writer.unrolled_range_loop(
+                    "i", start, stop, lambda i: writer.print(f"values.append({i})"), factor, step
+                )
+                writer.print("pass")
+            PythonWriter_module.load_source(writer.file.getvalue(), "constant").kernel(values)
+            assert values == list(range(start, stop, step))
+            if factor is None:
+                assert "for" not in writer.file.getvalue()
+
+    with pytest.raises(ValueError):
+        writer.unrolled_range_loop("i", "0", "n", print, factor=None)
+
+
+def test_load_source_linecache(monkeypatch):
+    monkeypatch.setattr(PythonWriter_module, "CODE_CACHE_SIZE", 2)
+    PythonWriter_module._code_cache.clear()
+    modules = [PythonWriter_module.load_source(f"x = {i}\n", f"m{i}") for i in range(3)]
+    assert modules[0].__file__ not in linecache.cache
+    assert all(module.__file__ in linecache.cache for module in modules[1:])
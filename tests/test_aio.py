@@ -0,0 +1,73 @@
+import asyncio
+from io import StringIO
+
+from CodeWriter import FortranWriter, AsyncFortranWriter
+
+
+class Stream:
+    def __init__(self):
+        self.data = b""
+        self.writes = 0
+        self.drains = 0
+
+    def write(self, data: bytes):
+        self.data += data
+        self.writes += 1
+
+    async def drain(self):
+        self.drains += 1
+
+
+def test_AsyncFortranWriter():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with writer.module("my_module"):
+        writer.contains()
+        for i in range(3):
+            with writer.subroutine(f"routine_{i}", "x"):
+                with writer.if_then("x > 0"):
+                    writer.print("x = 0")
+                with writer.select("x"):
+                    writer.case("1")
+                    writer.comment("äöü")
+
+    async def generate(writer: AsyncFortranWriter):
+        async with writer:
+            async with writer.module("my_module"):
+                writer.contains()
+                for i in range(3):
+                    async with writer.subroutine(f"routine_{i}", "x"):
+                        async with writer.if_then("x > 0"):
+                            writer.print("x = 0")
+                        async with writer.select("x"):
+                            writer.case("1")
+                            writer.comment("äöü")
+
+    stream = Stream()
+    asyncio.run(generate(AsyncFortranWriter(file=stream, buffer_size=100)))
+    assert stream.data.decode() == buffer.getvalue()
+    assert 1 < stream.writes < 10
+
+
+def test_async_fragment():
+    fragment = AsyncFortranWriter(file=Stream()).fragment()
+    assert isinstance(fragment, AsyncFortranWriter)
+    with fragment.subroutine("helper", trailing=False):
+        fragment.print("x = 1")
+
+    async def generate(writer: AsyncFortranWriter):
+        async with writer:
+            async with writer.module("my_module"):
+                writer.contains()
+                writer.splice(fragment)
+
+    stream = Stream()
+    asyncio.run(generate(AsyncFortranWriter(file=stream)))
+    assert stream.data.decode() == (
+        "module my_module\n"
+        "contains\n"
+        "    subroutine helper()\n"
+        "        x = 1\n"
+        "    end subroutine helper\n"
+        "end module my_module\n"
+    )
@@ -0,0 +1,74 @@
+import os
+from io import StringIO
+
+import pytest
+
+from CodeWriter import FortranWriter, FragmentCache
+
+calls = []
+
+
+def accessor(writer: FortranWriter, name: str, types: dict):
+    calls.append(name)
+    writer.use("kinds")
+    with writer.function(f"get_{name}", "i", result="value"):
+        for variable, type in types.items():
+            writer.declare(type, variable)
+
+
+def test_fragment_cache(tmp_path):
+    expected = StringIO()
+    writer = FortranWriter(file=expected)
+    with writer.module("m"):
+        writer.contains()
+        accessor(writer, "x", {"i": "integer", "value": "real"})
+    accessor(writer, "x", {"i": "integer", "value": "real"})
+
+    cached = FragmentCache(tmp_path)(accessor)
+    calls.clear()
+    for deferred in (False, True):
+        buffer = StringIO()
+        writer = FortranWriter(file=buffer, deferred=deferred)
+        with writer.module("m"):
+            writer.contains()
+            cached(writer, "x", {"i": "integer", "value": "real"})
+        cached(writer, "x", {"i": "integer", "value": "real"})
+        if deferred:
+            writer.render()
+        assert buffer.getvalue() == expected.getvalue()
+        assert writer.used_modules == ["kinds"]
+    assert calls == ["x"]
+
+    # a new cache in the same directory reuses the entries
+    cache = FragmentCache(tmp_path, max_bytes=0)
+    cached = cache(accessor)
+    cached(FortranWriter(file=StringIO()), "x", {"i": "integer", "value": "real"})
+    assert (cache.hits, cache.misses) == (1, 0)
+    cached(FortranWriter(file=StringIO()), "x", {"value": "real", "i": "integer"})
+    assert calls == ["x", "x"]
+    assert os.listdir(tmp_path) == []
+
+
+class Variable:
+    def __init__(self, name: str, type: str):
+        self.name = name
+        self.type = type
+
+
+def declaration(writer: FortranWriter, variable: Variable):
+    calls.append(variable.name)
+    writer.declare(variable.type, variable.name)
+
+
+def test_fragment_cache_key(tmp_path):
+    # the default representation contains the address of the object, which changes between processes
+    with pytest.raises(TypeError, match="Variable"):
+        FragmentCache(tmp_path)(declaration)(FortranWriter(file=StringIO()), Variable("x", "real"))
+
+    cached = FragmentCache(tmp_path, key=lambda variable: (variable.name, variable.type))(declaration)
+    calls.clear()
+    for variable in (Variable("x", "real"), Variable("x", "real"), Variable("x", "integer")):
+        buffer = StringIO()
+        cached(FortranWriter(file=buffer), variable)
+        assert buffer.getvalue() == f"{variable.type} :: x\n"
+    assert calls == ["x", "x"]
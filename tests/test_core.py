@@ -1,4 +1,11 @@
+import importlib
+import textwrap
+import time
 from io import StringIO
+from queue import Queue
+
+import pytest
+
 from CodeWriter import Writer
 
 
@@ -30,3 +37,225 @@ BEGIN BLOCK
 END BLOCK
 """
     )
+
+
+def write_example(writer: Writer):
+    writer.print("Line 1", "Line 2", sep="\n")
+    with writer.block("BEGIN BLOCK\nSECOND LINE", "END BLOCK\n"):
+        writer.print()
+        with writer.listing("BEGIN LISTING", "ITEM", "END LISTING"):
+            writer.item("item 1")
+            writer.print("text\nmore text")
+
+
+def test_buffered_writer():
+    expected = StringIO()
+    write_example(Writer(file=expected))
+
+    buffer = StringIO()
+    with Writer(file=buffer, buffer_size=1 << 16) as writer:
+        write_example(writer)
+        assert buffer.getvalue() == ""
+    assert buffer.getvalue() == expected.getvalue()
+
+    # a small buffer size forces several intermediate writes
+    buffer = StringIO()
+    writer = Writer(file=buffer, buffer_size=16)
+    write_example(writer)
+    writer.close()
+    assert buffer.getvalue() == expected.getvalue()
+
+
+def test_indentation_change():
+    buffer = StringIO()
+    writer = Writer(file=buffer)
+    with writer.block("BEGIN"):
+        writer.print("a\nb")
+        writer.indentation = "\t"
+        writer.print("c\nd")
+    assert buffer.getvalue() == "BEGIN\n    a\n    b\n\tc\n\td\n"
+    assert not hasattr(writer.block("BEGIN"), "__dict__")
+    assert not hasattr(writer.listing("BEGIN", "ITEM"), "__dict__")
+
+
+def test_write_lines():
+    lines = ["a", "", "b\nc"]
+    expected = StringIO()
+    writer = Writer(file=expected)
+    with writer.block("BEGIN", "END"):
+        for line in lines:
+            writer.print(line)
+        writer.print("d\ne")
+
+    buffer = StringIO()
+    writer = Writer(file=buffer)
+    writer._lines_per_write = 2
+    with writer.block("BEGIN", "END"):
+        writer.write_lines(line for line in lines)
+        writer.write_lines([])
+        writer.write_block_text("d\ne")
+    assert buffer.getvalue() == expected.getvalue()
+
+
+def test_deferred_writer():
+    expected = StringIO()
+    writer = Writer(file=expected, indentation_level=1)
+    write_example(writer)
+
+    writer = Writer(indentation_level=1, deferred=True)
+    write_example(writer)
+    for _ in range(2):
+        buffer = StringIO()
+        writer.render(buffer)
+        assert buffer.getvalue() == expected.getvalue()
+
+    # render a single block at another level
+    buffer = StringIO()
+    writer.render(buffer, writer.tree.children[-1], indentation_level=2)
+    assert buffer.getvalue() == (
+        "        BEGIN BLOCK\n"
+        "                SECOND LINE\n"
+        "            \n"
+        "            BEGIN LISTING\n"
+        "                ITEM item 1\n"
+        "                    text\n"
+        "                    more text\n"
+        "            END LISTING\n"
+        "        END BLOCK\n"
+        "                \n"
+    )
+
+
+def test_fragment():
+    writer = Writer(indentation=" " * 2, deferred=True)
+    fragment = writer.fragment()
+    with fragment.block("BEGIN FRAGMENT\nSECOND LINE", "END FRAGMENT"):
+        fragment.print("Line 1\nLine 2")
+
+    for deferred in (False, True):
+        buffer = StringIO()
+        writer = Writer(indentation=" " * 2, file=buffer, deferred=deferred)
+        writer.splice(fragment)
+        with writer.block("BEGIN BLOCK", "END BLOCK"):
+            writer.splice(fragment)
+        if deferred:
+            writer.render()
+        assert (
+            buffer.getvalue()
+            == """\
+BEGIN FRAGMENT
+SECOND LINE
+  Line 1
+  Line 2
+END FRAGMENT
+BEGIN BLOCK
+  BEGIN FRAGMENT
+    SECOND LINE
+    Line 1
+    Line 2
+  END FRAGMENT
+END BLOCK
+"""
+        )
+
+
+def test_stream():
+    expected = StringIO()
+    write_example(Writer(file=expected))
+
+    chunks = list(Writer.stream(write_example, chunk_size=8, max_chunks=1))
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected.getvalue()
+    lines = list(Writer.stream(write_example, lines=True, chunk_size=8))
+    assert lines == expected.getvalue().splitlines(keepends=True)
+
+    # stop early while the script is still running
+    written = []
+
+    def endless(writer: Writer):
+        i = 0
+        while True:
+            written.append(i)
+            writer.print(f"Line {i}")
+            i += 1
+
+    lines = Writer.stream(endless, lines=True, chunk_size=64, max_chunks=2)
+    assert [next(lines) for _ in range(3)] == ["Line 0\n", "Line 1\n", "Line 2\n"]
+    lines.close()
+    assert len(written) < 100
+
+    def failing(writer: Writer):
+        writer.print("Line")
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        list(Writer.stream(failing))
+
+
+def test_placeholder():
+    for deferred in (False, True):
+        buffer = StringIO()
+        writer = Writer(indentation=" " * 2, file=buffer, deferred=deferred)
+        with writer.block("MODULE example", "END MODULE example"):
+            uses = writer.placeholder()
+            writer.print("IMPLICIT NONE")
+            if not deferred:
+                assert buffer.getvalue() == "MODULE example\n"
+            fragment = writer.fragment()
+            fragment.print("! generated")
+            uses.fill("USE first", "USE second", fragment)
+            with pytest.raises(RuntimeError, match="already filled"):
+                uses.fill("USE third")
+        if deferred:
+            writer.render()
+        assert (
+            buffer.getvalue()
+            == """\
+MODULE example
+  USE first
+  USE second
+  ! generated
+  IMPLICIT NONE
+END MODULE example
+"""
+        )
+
+    writer = Writer(file=StringIO(), buffer_size=1 << 10)
+    writer.placeholder()
+    with pytest.raises(RuntimeError, match="unfilled"):
+        writer.close()
+
+
+def test_include_file(tmp_path):
+    content = "    subroutine f()\n\n      x = 1\n  \n    end subroutine f\n    ! Ä"
+    path = tmp_path / "snippet.f90"
+    path.write_text(content, encoding="utf-8")
+    for dedent in (False, True):
+        expected = StringIO()
+        writer = Writer(indentation=" " * 2, indentation_level=1, file=expected)
+        writer.write_lines((textwrap.dedent(content) if dedent else content).splitlines())
+        for chunk_size in (1, 7, 1 << 16):
+            buffer = StringIO()
+            writer = Writer(indentation=" " * 2, indentation_level=1, file=buffer)
+            writer.include_file(path, dedent=dedent, chunk_size=chunk_size)
+            assert buffer.getvalue() == expected.getvalue()
+
+
+def test_stream_stopped(monkeypatch):
+    core = importlib.import_module("CodeWriter.core")
+
+    class SlowQueue(Queue):
+        # keep the script running for a moment after it stopped
+        def put(self, item, *args, **kwargs):
+            super().put(item, *args, **kwargs)
+            if isinstance(item, core._Stop):
+                time.sleep(0.1)
+
+    monkeypatch.setattr(core, "Queue", SlowQueue)
+    assert list(Writer.stream(write_example)) != []
+
+    def failing(writer: Writer):
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        list(Writer.stream(failing))
@@ -0,0 +1,137 @@
+import shutil
+import subprocess
+from io import StringIO
+
+import pytest
+
+from CodeWriter import FortranWriter, PythonWriter, deduplicate
+
+
+def helper(writer: FortranWriter, factor: int = 2):
+    with writer.function("helper", "x", result="y", pure=True):
+        writer.declare("real", "x", intent="in")
+        writer.declare("real", "y")
+        writer.print(f"y = {factor} * x")
+
+
+def test_deduplicate_fortran():
+    writer = FortranWriter(deferred=True)
+    for name in ("a", "b", "c"):
+        with writer.module(name):
+            writer.print("implicit none")
+            writer.contains()
+            helper(writer, 3 if name == "c" else 2)
+            with writer.subroutine(f"routine_{name}"):
+                writer.print("call work()")
+    report = deduplicate(writer, "shared")
+    assert report.routines == 1
+    assert report.bytes > 0
+
+    buffer = StringIO()
+    writer.render(buffer)
+    assert buffer.getvalue().startswith(
+        """\
+module shared
+    implicit none
+contains
+    pure function helper(x) result(y)
+        real, intent(in) :: x
+        real :: y
+        y = 2 * x
+    end function helper
+        
+end module shared
+module a
+    use shared, only: helper
+    implicit none
+contains
+    subroutine routine_a()
+        call work()
+    end subroutine routine_a
+        
+end module a
+module b
+    use shared, only: helper
+"""
+    )
+    assert buffer.getvalue().count("y = 3 * x") == 1
+    assert buffer.getvalue().count("pure function helper") == 2
+
+
+def test_deduplicate_python():
+    writer = PythonWriter(deferred=True)
+    for value in (1, 1, 2, 1, 1):
+        with writer.function("f"):
+            writer.print(f"return {value}")
+        writer.print("print(f())")
+    assert deduplicate(writer).routines == 2
+
+    buffer = StringIO()
+    writer.render(buffer)
+    assert buffer.getvalue().count("def f():") == 3
+
+
+def test_deduplicate_spliced():
+    fragment = FortranWriter(deferred=True).fragment()
+    helper(fragment)
+    writer = FortranWriter(deferred=True)
+    for name in ("a", "b"):
+        with writer.module(name):
+            writer.print("implicit none")
+            writer.contains()
+            writer.splice(fragment)
+    assert deduplicate(writer, "shared").routines == 1
+
+    buffer = StringIO()
+    writer.render(buffer)
+    assert buffer.getvalue().count("pure function helper") == 1
+    assert buffer.getvalue().count("use shared, only: helper") == 2
+    # the fragment itself is unchanged
+    assert len(fragment.tree.children) == 1
+
+
+def test_deduplicate_fortran_uses(tmp_path):
+    writer = FortranWriter(deferred=True)
+    for name, kind in (("a", "dp"), ("b", "dp"), ("c", "sp"), ("d", "sp")):
+        with writer.module(name):
+            writer.use(f"iso_fortran_env, only: {kind} => real{64 if kind == 'dp' else 32}")
+            writer.print("implicit none")
+            writer.contains()
+            with writer.function("helper", "x", result="y", pure=True):
+                writer.declare(f"real({kind})", "x", intent="in")
+                writer.declare(f"real({kind})", "y")
+                writer.print("y = 2 * x")
+    report = deduplicate(writer, "shared")
+    assert report.routines == 2
+
+    buffer = StringIO()
+    writer.render(buffer)
+    text = buffer.getvalue()
+    assert text.startswith("module shared\n    use iso_fortran_env, only: dp => real64\n    implicit none\n")
+    assert "module shared_2\n    use iso_fortran_env, only: sp => real32\n" in text
+    assert "module c\n    use shared_2, only: helper\n" in text
+    assert text.count("pure function helper") == 2
+
+    if shutil.which("gfortran") is None:
+        pytest.skip("gfortran is not installed")
+    path = tmp_path / "modules.f90"
+    path.write_text(text)
+    subprocess.run(["gfortran", "-c", "-Werror", str(path)], cwd=tmp_path, check=True)
+
+
+def test_deduplicate_python_rebinding():
+    for rebinding in ("f = 3", "import os as f", "class f:\n    pass", "del f", "for f in range(2):\n    pass"):
+        writer = PythonWriter(deferred=True)
+        for _ in range(2):
+            with writer.function("f"):
+                writer.print("return 1")
+            writer.print(rebinding)
+        assert deduplicate(writer).routines == 0
+
+    # uses of the name do not prevent sharing the definition
+    writer = PythonWriter(deferred=True)
+    for _ in range(2):
+        with writer.function("f"):
+            writer.print("return 1")
+        writer.print("g = f()")
+    assert deduplicate(writer).routines == 1
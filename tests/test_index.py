@@ -0,0 +1,60 @@
+import os
+
+from CodeWriter import FortranWriter, BlockIndex, IndexedFile
+
+
+def test_block_index(tmp_path):
+    path = os.path.join(tmp_path, "example.f90")
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = FortranWriter(file=file, buffer_size=1 << 10)
+        with BlockIndex(writer) as index:
+            writer.comment("Ä header")
+            with writer.module("my_module"):
+                writer.contains()
+                for i in range(3):
+                    with writer.subroutine(f"routine_{i}", trailing=False):
+                        writer.print("x = 1")
+        writer.close()
+    assert "_write" not in writer.__dict__
+    index.save(path + ".idx")
+
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines(keepends=True)
+    with IndexedFile(path) as indexed:
+        assert len(indexed) == 4
+        module = indexed.find("module my_module")
+        assert indexed.index.path(module) == ("module my_module",)
+        assert indexed.text(module) == "".join(lines[indexed.lines(module).start :])
+        routine = indexed.find("module my_module", "subroutine routine_1()")
+        assert indexed.index.parents[routine] == module
+        assert indexed.text(routine) == "".join(lines[r] for r in indexed.lines(routine))
+        assert indexed.text(routine).splitlines()[1].strip() == "x = 1"
+
+
+def test_block_index_placeholder(tmp_path):
+    path = os.path.join(tmp_path, "example.f90")
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = FortranWriter(file=file)
+        with BlockIndex(writer) as index:
+            with writer.module("my_module"):
+                uses = writer.placeholder()
+                writer.print("implicit none")
+                writer.contains()
+                with writer.subroutine("s", trailing=False):
+                    writer.print("x = 1")
+            with writer.module("other"):
+                writer.print("implicit none")
+            uses.fill("use a", "use ä")
+        writer.close()
+
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines(keepends=True)
+    with IndexedFile(path, index) as indexed:
+        module = indexed.find("module my_module")
+        assert indexed.text(module) == "".join(lines[r] for r in indexed.lines(module))
+        assert indexed.text(module).splitlines()[2] == "    use ä"
+        routine = indexed.find("module my_module", "subroutine s()")
+        assert indexed.text(routine).startswith("    subroutine s()\n")
+        assert indexed.text(routine) == "".join(lines[r] for r in indexed.lines(routine))
+        other = indexed.find("module other")
+        assert indexed.text(other) == "".join(lines[indexed.lines(other).start :])
@@ -0,0 +1,71 @@
+import os
+from functools import partial
+from io import StringIO
+
+from CodeWriter import FortranWriter, generate_parallel, generate_files
+
+
+def subroutine(name: str, writer: FortranWriter):
+    with writer.subroutine(name, "x", trailing=False):
+        writer.declare("real", "x", intent="inout")
+        writer.print("x = 2 * x")
+
+
+def expected_module(names):
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with writer.module("my_module"):
+        writer.contains()
+        for name in names:
+            subroutine(name, writer)
+    return buffer.getvalue()
+
+
+def test_generate_parallel():
+    names = [f"routine_{i}" for i in range(10)]
+    for deferred in (False, True):
+        buffer = StringIO()
+        writer = FortranWriter(file=buffer, deferred=deferred)
+        with writer.module("my_module"):
+            writer.contains()
+            generate_parallel(
+                [partial(subroutine, name) for name in names], writer, max_workers=2
+            )
+        if deferred:
+            writer.render()
+        assert buffer.getvalue() == expected_module(names)
+
+
+def test_generate_files(tmp_path):
+    paths = generate_files(
+        {f"src/routine_{i}.f90": partial(subroutine, f"routine_{i}") for i in range(3)},
+        tmp_path,
+        FortranWriter,
+        max_workers=2,
+        indentation="  ",
+    )
+    assert paths == [os.path.join(tmp_path, f"src/routine_{i}.f90") for i in range(3)]
+    with open(paths[1]) as file:
+        assert file.read() == (
+            "subroutine routine_1(x)\n"
+            "  real, intent(inout) :: x\n"
+            "  x = 2 * x\n"
+            "end subroutine routine_1\n"
+        )
+
+    # files are encoded independently of the locale
+    (path,) = generate_files({"ä.f90": partial(subroutine, "routine_ä")}, tmp_path, FortranWriter, encoding="latin-1")
+    with open(path, "rb") as file:
+        assert file.read().startswith("subroutine routine_ä(x)".encode("latin-1"))
+
+
+def use_module(name: str, writer: FortranWriter):
+    writer.use(name)
+
+
+def test_generate_parallel_used_modules():
+    for deferred in (False, True):
+        writer = FortranWriter(file=StringIO(), deferred=deferred)
+        with writer.module("my_module"):
+            generate_parallel([partial(use_module, name) for name in ("a", "b")], writer, max_workers=2)
+        assert writer.used_modules == ["a", "b"]
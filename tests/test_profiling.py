@@ -0,0 +1,55 @@
+from io import StringIO
+
+from CodeWriter import FortranWriter, Profiler
+
+
+def test_profiler():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with Profiler(writer) as profiler:
+        writer.comment("header")
+        with writer.module("my_module"):
+            writer.contains()
+            for i in range(3):
+                with profiler.label("routines"):
+                    with writer.subroutine(f"routine_{i}", trailing=False):
+                        writer.print("x = 1")
+    assert "print" not in writer.__dict__
+
+    root = ("FortranWriter",)
+    module = (*root, "module my_module")
+    assert profiler.blocks[root][:1] + profiler.blocks[root][2:] == [1, 1, 9]
+    assert profiler.blocks[module][0] == 1
+    assert profiler.blocks[module][2:] == [3, 47]
+    assert profiler.blocks[(*module, "routines")][:1] == [3]
+    assert profiler.blocks[(*module, "routines", "subroutine routine_2()")][2] == 3
+    assert profiler.methods["subroutine"][0] == 3
+    assert profiler.methods["print"][0] == 5
+
+    report = profiler.report()
+    assert "FortranWriter > module my_module > routines" in report
+    assert profiler.collapsed("lines").splitlines()[:2] == [
+        "FortranWriter 1",
+        "FortranWriter;module my_module 3",
+    ]
+    assert buffer.getvalue().count("\n") == 13
+
+
+def test_profiler_placeholder():
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer)
+    with Profiler(writer) as profiler:
+        with writer.subroutine("routine", trailing=False):
+            declarations = writer.placeholder()
+            writer.print("x = 1")
+            fragment = writer.fragment()
+            for i in range(1500):
+                fragment.print(f"y({i}) = {i}")
+            declarations.fill("real :: x", fragment)
+    assert "_fill" not in writer.__dict__
+
+    lines = buffer.getvalue().count("\n")
+    assert lines == 1504
+    stats = profiler.blocks[("FortranWriter", "subroutine routine()")]
+    assert stats[2] + profiler.blocks[("FortranWriter",)][2] == lines
+    assert stats[3] + profiler.blocks[("FortranWriter",)][3] == len(buffer.getvalue())
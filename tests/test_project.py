@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from CodeWriter import FortranProject
+
+
+def generate(directory, value: int = 1):
+    with FortranProject(directory, indentation="  ") as project:
+        for name, used in (("app", ["physics", "io"]), ("physics", ["constants"]), ("io", []), ("constants", [])):
+            with project.module(name) as writer:
+                writer.use("iso_fortran_env, only: dp => real64")
+                for module in used:
+                    writer.use(f"{module}, only: x")
+                writer.print("implicit none")
+                if name == "constants":
+                    writer.print(f"integer, parameter :: x = {value}")
+    return project
+
+
+def test_fortran_project(tmp_path):
+    project = generate(tmp_path)
+    assert len(project.changed) == 4
+    assert project.levels() == [["io", "constants"], ["physics"], ["app"]]
+    assert (tmp_path / "physics.f90").read_text() == (
+        "module physics\n"
+        "  use iso_fortran_env, only: dp => real64\n"
+        "  use constants, only: x\n"
+        "  implicit none\n"
+        "end module physics\n"
+    )
+    manifest = json.loads((tmp_path / "modules.json").read_text())
+    assert manifest["levels"] == [["io", "constants"], ["physics"], ["app"]]
+    assert (tmp_path / "modules.mk").read_text().splitlines()[1:] == [
+        "app.o: app.f90 physics.o io.o",
+        "physics.o: physics.f90 constants.o",
+        "io.o: io.f90",
+        "constants.o: constants.f90",
+    ]
+
+    assert generate(tmp_path).changed == []
+    assert generate(tmp_path, 2).changed == [str(tmp_path / "constants.f90")]
+
+
+def test_cyclic_dependencies(tmp_path):
+    project = FortranProject(tmp_path, manifest=None, makefile=None)
+    for name, used in (("a", "b"), ("b", "a")):
+        with project.module(name) as writer:
+            writer.use(used)
+    project.close()
+    with pytest.raises(ValueError, match="cyclic"):
+        project.levels()
+
+
+def test_inserted_dependencies(tmp_path):
+    with FortranProject(tmp_path) as project:
+        with project.module("a") as writer:
+            fragment = writer.fragment()
+            fragment.use("b, only: x")
+            placeholder = writer.placeholder()
+            writer.splice(fragment)
+            placeholder.fill("use, intrinsic :: iso_c_binding", "USE c\nuse d")
+        for name in "bcd":
+            with project.module(name):
+                pass
+    assert project.dependencies["a"] == ["b", "iso_c_binding", "c", "d"]
+    assert project.levels() == [["b", "c", "d"], ["a"]]
+    assert (tmp_path / "modules.mk").read_text().splitlines()[1] == "a.o: a.f90 b.o c.o d.o"
@@ -0,0 +1,51 @@
+import gzip
+import lzma
+import os
+import sys
+from io import BytesIO
+
+from CodeWriter import PythonWriter, CompressedSink, TeeSink, PipeSink, FileUpdater
+
+
+def generate(updater: FileUpdater, value: int):
+    for name in ("a.py", "sub/b.py"):
+        with PythonWriter(file=updater.open(name)) as writer:
+            with writer.function("f"):
+                writer.print(f"return {value if name == 'a.py' else 0}")
+
+
+def test_file_updater(tmp_path):
+    with FileUpdater(tmp_path) as updater:
+        generate(updater, 1)
+    assert updater.changed == [str(tmp_path / "a.py"), str(tmp_path / "sub/b.py")]
+    assert (tmp_path / "a.py").read_text() == "def f():\n    return 1\n \n"
+    os.utime(tmp_path / "sub/b.py", (0, 0))
+
+    with FileUpdater(tmp_path) as updater:
+        generate(updater, 2)
+    assert updater.changed == [str(tmp_path / "a.py")]
+    assert updater.unchanged == [str(tmp_path / "sub/b.py")]
+    assert (tmp_path / "a.py").read_text() == "def f():\n    return 2\n \n"
+    assert os.stat(tmp_path / "sub/b.py").st_mtime == 0
+    assert sorted(os.listdir(tmp_path)) == ["a.py", "sub"]
+
+
+def test_sinks(tmp_path):
+    copy = BytesIO()
+    copy.close = lambda: None
+    upper = open(tmp_path / "upper.py", "wb")
+    pipe = PipeSink(
+        [sys.executable, "-c", "import sys; sys.stdout.write(sys.stdin.read().upper())"],
+        stdout=upper,
+    )
+    sink = TeeSink(CompressedSink(tmp_path / "a.py.gz"), CompressedSink(tmp_path / "a.py.xz"), pipe, copy)
+    with sink, PythonWriter(file=sink, buffer_size=4) as writer:
+        with writer.function("f"):
+            writer.print("return 'ä'")
+    upper.close()
+
+    expected = "def f():\n    return 'ä'\n \n"
+    assert copy.getvalue() == expected.encode()
+    assert gzip.open(tmp_path / "a.py.gz", "rt", encoding="utf-8").read() == expected
+    assert lzma.open(tmp_path / "a.py.xz", "rt", encoding="utf-8").read() == expected
+    assert (tmp_path / "upper.py").read_text(encoding="utf-8") == expected.upper()
@@ -0,0 +1,51 @@
+from io import StringIO
+
+import pytest
+
+from CodeWriter import FortranWriter, LatexWriter, Template
+
+
+def accessor(writer: FortranWriter, name: str, type: str, arguments: str):
+    with writer.function(f"get_{name}", arguments, result="value", pure=True):
+        writer.declare(type, arguments, intent="in")
+        writer.declare(type, "value")
+        writer.print(f"value = {name}({arguments})")
+
+
+def test_template():
+    template = Template(
+        accessor, "name", "type", "arguments", writer_cls=FortranWriter, indentation_level=1
+    )
+    for name, type, arguments in (("x", "real", "i"), ("data", "integer(8)", "i, j")):
+        buffer = StringIO()
+        accessor(FortranWriter(file=buffer, indentation_level=1), name, type, arguments)
+        assert template.render(name=name, type=type, arguments=arguments) == buffer.getvalue()
+
+    # newlines in values are indented like in the live writer, i.e. twice in entry lines of blocks
+    expected = StringIO()
+    accessor(FortranWriter(file=expected, indentation_level=1), "x", "real", "i,\nj")
+    buffer = StringIO()
+    writer = FortranWriter(file=buffer, indentation_level=1)
+    template.write(writer, name="x", type="real", arguments="i,\nj")
+    assert buffer.getvalue() == expected.getvalue()
+    assert buffer.getvalue().splitlines()[:3] == [
+        "    pure function get_x(i,",
+        "        j) result(value)",
+        "        real, intent(in) :: i,",
+    ]
+
+
+def test_template_changed_parameter():
+    def comment(writer: FortranWriter, text: str):
+        writer.comment(text)
+
+    template = Template(comment, "text", writer_cls=FortranWriter)
+    assert template.render(text="single line") == "! single line\n"
+    with pytest.raises(ValueError, match="newline"):
+        template.render(text="first\nsecond")
+
+    def table(writer: LatexWriter, cell: str):
+        writer.tabular([[cell]], "l")
+
+    with pytest.raises(ValueError, match="changed"):
+        Template(table, "cell", writer_cls=LatexWriter)